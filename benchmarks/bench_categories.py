@@ -0,0 +1,65 @@
+"""Micro-benchmark for rfcpy.helpers.utils.get_categories.
+
+Times the per-document cost of the precompiled category classifier against
+the previous implementation, which title-cased the header and ran one
+re.findall per category.
+
+Run from the repository root:
+    $ python -m benchmarks.bench_categories
+"""
+
+import re
+import timeit
+
+from rfcpy.helpers.utils import CATEGORIES, classify_categories, get_categories
+
+HEADER = """
+Internet Engineering Task Force (IETF)                       E. Rescorla
+Request for Comments: 8446                                       Mozilla
+Obsoletes: 5077, 5246, 6961                                  August 2018
+Updates: 5705, 6066
+Category: Standards Track
+ISSN: 2070-1721
+
+
+        The Transport Layer Security (TLS) Protocol Version 1.3
+"""
+UNCATEGORISED = "Network Working Group\nRequest for Comments: 1\n" * 10
+DOCUMENTS = [HEADER, UNCATEGORISED] * 500
+
+
+def legacy_get_categories(text):
+    header = text[:500]
+    match = [
+        x
+        for x in [re.findall(x.title(), header.title()) for x in CATEGORIES]
+        if len(x) > 0
+    ]
+    try:
+        return match[0][0]
+    except IndexError:
+        return "Uncategorised"
+
+
+def per_document(function, repeat=5):
+    """Best time in microseconds for function to classify one document."""
+
+    runs = timeit.repeat(
+        lambda: [function(text) for text in DOCUMENTS], number=10, repeat=repeat
+    )
+    return min(runs) / (10 * len(DOCUMENTS)) * 1e6
+
+
+def main():
+    assert [legacy_get_categories(t) for t in DOCUMENTS] == classify_categories(
+        DOCUMENTS
+    )
+    legacy = per_document(legacy_get_categories)
+    current = per_document(get_categories)
+    print(f"legacy get_categories:  {legacy:8.2f} us/document")
+    print(f"current get_categories: {current:8.2f} us/document")
+    print(f"speedup:                {legacy / current:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
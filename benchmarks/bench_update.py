@@ -0,0 +1,231 @@
+"""Benchmark the update stages and queries against synthetic corpora.
+
+For each corpus size a fresh database is built in a temporary directory and
+the following are timed:
+
+    uncompress_tar, get_title_index, get_categories, write_to_db,
+    pipeline_to_db and build_body_index, once each
+    search, search_body, get_rfc, latest and random_rfc, repeatedly
+
+Results are written as JSON. Given a previous results file with --baseline,
+any stage or median query time slower than the baseline by more than
+--tolerance is reported and the exit status is 1, for use in CI.
+
+Run from the repository root:
+    $ python -m benchmarks.bench_update --sizes 100 1000 --output results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import WORDS, write_corpus
+from rfcpy import queries
+from rfcpy.helpers.config import Config
+from rfcpy.helpers.ingest import (get_title_index, pipeline_to_db,
+                                  uncompress_tar, write_to_db)
+from rfcpy.helpers.utils import classify_categories
+from rfcpy.models import build_body_index, db, open_database
+
+
+def timed(function, *args, **kwargs):
+    """Seconds taken by function(*args, **kwargs), its output is discarded."""
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        return time.perf_counter() - start
+
+
+def latencies(function, arguments):
+    """Median and 95th percentile in milliseconds of function over arguments."""
+
+    samples = []
+    for args in arguments:
+        start = time.perf_counter()
+        function(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 4),
+        "runs": len(samples),
+    }
+
+
+def file_chunks(path, size=1024 * 1024):
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(size), b"")
+
+
+@contextlib.contextmanager
+def sandbox(directory):
+    """Point Config and the database at directory for the duration."""
+
+    names = ("ROOT_FOLDER", "STORAGE_PATH", "DATABASE_PATH", "VALIDATORS_FILE")
+    previous = {name: getattr(Config, name) for name in names}
+    Config.ROOT_FOLDER = directory
+    Config.STORAGE_PATH = os.path.join(directory, "rfc_files/")
+    Config.DATABASE_PATH = os.path.join(directory, Config.DATABASE)
+    Config.VALIDATORS_FILE = os.path.join(directory, "validators.json")
+    try:
+        open_database()
+        yield
+    finally:
+        db.close()
+        for name, value in previous.items():
+            setattr(Config, name, value)
+        open_database()
+
+
+def reset_database():
+    db.close()
+    for suffix in ("", "-wal", "-shm"):
+        path = Config.DATABASE_PATH + suffix
+        if os.path.exists(path):
+            os.remove(path)
+    open_database()
+
+
+def time_queries(documents, repeat, rng):
+    numbers = [number for number, _ in documents]
+    terms = [(rng.choice(WORDS),) for _ in range(repeat)]
+
+    def search(term):
+        return list(queries.search(term, limit=20))
+
+    def search_body(term):
+        return list(queries.search_body(term, limit=20)[1])
+
+    def get_rfc(number):
+        queries.CACHE.clear()  # time the database, not the LRU cache
+        return queries.get_rfc(number)
+
+    return {
+        "search": latencies(search, terms),
+        "search_body": latencies(search_body, terms),
+        "get_rfc": latencies(get_rfc, [(rng.choice(numbers),) for _ in range(repeat)]),
+        "latest": latencies(lambda: list(queries.latest(10)), [()] * repeat),
+        "random_rfc": latencies(queries.random_rfc, [()] * repeat),
+    }
+
+
+def run(size, directory, repeat=50, workers=None, seed=0):
+    """Benchmark one corpus size inside directory.
+
+    :return dict of results for this size.
+    """
+
+    tar_path, documents, index_text = write_corpus(
+        os.path.join(directory, "corpus"), size, seed
+    )
+    texts = [text for _, text in documents]
+    stages = {}
+    with sandbox(os.path.join(directory, "root")):
+        os.makedirs(Config.ROOT_FOLDER, exist_ok=True)
+        # uncompress_tar removes the tarball it extracts, so give it a copy
+        shutil.copy(tar_path, os.path.join(Config.ROOT_FOLDER, Config.FILENAME))
+        stages["uncompress_tar"] = timed(uncompress_tar)
+        stages["get_title_index"] = timed(get_title_index)
+        stages["get_categories"] = timed(classify_categories, texts)
+        stages["write_to_db"] = timed(write_to_db, workers=workers)
+        reset_database()
+        title_index = get_title_index(index_text)
+        stages["pipeline_to_db"] = timed(
+            pipeline_to_db, file_chunks(tar_path), title_index, workers=workers
+        )
+        stages["build_body_index"] = timed(build_body_index)
+        query_times = time_queries(documents, repeat, random.Random(seed))
+        database_bytes = os.path.getsize(Config.DATABASE_PATH)
+    return {
+        "rfcs": size,
+        "corpus_bytes": sum(len(text) for text in texts),
+        "tarball_bytes": os.path.getsize(tar_path),
+        "database_bytes": database_bytes,
+        "stages": {name: round(seconds, 4) for name, seconds in stages.items()},
+        "queries": query_times,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against baseline, matched by corpus size.
+
+    :return list of messages, empty if nothing got slower than tolerance.
+    """
+
+    previous = {run["rfcs"]: run for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        base = previous.get(run["rfcs"])
+        if base is None:
+            continue
+        timings = [
+            (f"stage {name}", run["stages"], base["stages"], name)
+            for name in run["stages"]
+        ]
+        timings += [
+            (f"query {name}", run["queries"], base["queries"], name)
+            for name in run["queries"]
+        ]
+        for label, current, old, name in timings:
+            if name not in old:
+                continue
+            now, then = current[name], old[name]
+            if isinstance(now, dict):
+                now, then = now["median_ms"], then["median_ms"]
+            if then and now > then * (1 + tolerance):
+                regressions.append(
+                    f"{run['rfcs']} RFC's: {label} took {now} against {then}"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "workers": args.workers or Config.WORKERS,
+        "runs": [],
+    }
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            result = run(size, directory, args.repeat, args.workers, args.seed)
+        results["runs"].append(result)
+        stages = ", ".join(f"{k} {v:.3f}s" for k, v in result["stages"].items())
+        print(f"{size} RFC's: {stages}")
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Synthetic RFC corpus for benchmarks, generated offline.
+
+Builds N RFC's with realistic headers, a matching rfc-index.txt and a
+RFC-all.tar.gz laid out like the one published by the RFC Editor. Output is
+deterministic for a given seed so results can be compared between runs.
+
+Run from the repository root:
+    $ python -m benchmarks.corpus 1000 /tmp/corpus
+"""
+
+import argparse
+import io
+import os
+import random
+import tarfile
+
+from rfcpy.helpers.utils import CATEGORIES
+
+MONTHS = (
+    "January February March April May June July August September October "
+    "November December"
+).split()
+WORDS = (
+    "protocol transport network address router packet header security key "
+    "session stream frame connection server client request response message "
+    "encoding compression congestion control flow window timeout retransmit "
+    "handshake certificate cipher authentication extension option registry "
+    "iana considerations implementation interoperability datagram tunnel "
+    "multicast routing domain name resolver cache record zone http tls quic "
+    "ipv6 ipv4 tcp udp dns mail smtp uri media type error status version"
+).split()
+STATUSES = ("PROPOSED STANDARD", "INFORMATIONAL", "EXPERIMENTAL", "UNKNOWN")
+
+
+def title(number, rng):
+    words = rng.sample(WORDS, rng.randint(3, 8))
+    return f"{' '.join(words).title()} {number}"
+
+
+def paragraph(rng, sentences=6):
+    lines = []
+    for _ in range(sentences):
+        words = rng.choices(WORDS, k=rng.randint(8, 20))
+        lines.append(" ".join(words).capitalize() + ".")
+    return "   " + " ".join(lines)
+
+
+def make_rfc(number, rng, paragraphs=40):
+    """Text of one synthetic RFC, roughly 1KB per paragraph.
+
+    :return tuple of (title, date, text)
+    """
+
+    year = rng.randint(1970, 2024)
+    month = rng.choice(MONTHS)
+    heading = title(number, rng)
+    header = (
+        f"Internet Engineering Task Force (IETF){'A. Author':>33}\n"
+        f"Request for Comments: {number}{'Example Corp':>40}\n"
+        f"Category: {rng.choice(CATEGORIES)}{f'{month} {year}':>40}\n"
+        f"ISSN: 2070-1721\n\n\n"
+        f"{heading:^72}\n\n"
+    )
+    body = "\n\n".join(paragraph(rng) for _ in range(paragraphs))
+    return heading, f"{month} {year}", header + body
+
+
+def index_entry(number, heading, date, rng):
+    return (
+        f"{number:04d} {heading}. A. Author, B. Writer. {date}. (Format: TXT) "
+        f"(Status: {rng.choice(STATUSES)}) (DOI: 10.17487/RFC{number:04d})"
+    )
+
+
+def generate(count, seed=0, paragraphs=40):
+    """Build count RFC's numbered from 1, with a few numbers left unissued.
+
+    :return tuple of (documents, index_text). documents is a list of
+            (number, text) tuples.
+    """
+
+    rng = random.Random(seed)
+    documents, entries = [], []
+    number = 0
+    while len(documents) < count:
+        number += 1
+        if rng.random() < 0.02:
+            entries.append(f"{number:04d} Not Issued.")
+            continue
+        heading, date, text = make_rfc(number, rng, paragraphs)
+        documents.append((number, text))
+        entries.append(index_entry(number, heading, date, rng))
+    header = "\n" + " " * 31 + "RFC INDEX\n" + " " * 29 + "-------------\n\n"
+    return documents, header + "\n\n".join(entries) + "\n"
+
+
+def _add(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def write_tarball(path, documents, index_text):
+    """Write documents and rfc-index.txt to a tar.gz at path, rfc-index.txt
+    last as in the published tarball."""
+
+    with tarfile.open(path, "w:gz") as tar:
+        for number, text in documents:
+            _add(tar, f"rfc{number}.txt", text.encode())
+        _add(tar, "rfc-index.txt", index_text.encode())
+
+
+def write_corpus(directory, count, seed=0, paragraphs=40):
+    """Generate a corpus into directory.
+
+    :return tuple of (tarball path, documents, index_text)
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    documents, index_text = generate(count, seed, paragraphs)
+    with open(os.path.join(directory, "rfc-index.txt"), "w") as f:
+        f.write(index_text)
+    path = os.path.join(directory, "RFC-all.tar.gz")
+    write_tarball(path, documents, index_text)
+    return path, documents, index_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("count", type=int, help="number of RFC's to generate")
+    parser.add_argument("directory", help="where to write the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--paragraphs", type=int, default=40, help="~1KB each")
+    args = parser.parse_args()
+    path, documents, _ = write_corpus(
+        args.directory, args.count, args.seed, args.paragraphs
+    )
+    print(f"{len(documents)} RFC's written to {path}")
+
+
+if __name__ == "__main__":
+    main()
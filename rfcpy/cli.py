@@ -0,0 +1,298 @@
+"""Command line entry point for RFC.py.
+
+Running ``rfc`` on its own starts the interactive home page. The commands
+below are for scripts: they open the database read-only, skip the logo,
+config and weekly update checks and print straight to stdout.
+"""
+
+import json
+import os
+import statistics
+import time
+
+import click
+from peewee import DoesNotExist, OperationalError
+
+from rfcpy import queries
+from rfcpy.helpers.config import Config
+from rfcpy.helpers.display import title_without_number
+from rfcpy.helpers.instrumentation import flush, span
+from rfcpy.models import (Bookmark, DataBody, add_bookmarks, build_body_index,
+                          create_tables, db, maintain_database,
+                          migrate_compression, open_database, open_read_only,
+                          remove_bookmarks)
+
+# commands which modify the database and so skip the read-only connection.
+WRITE_COMMANDS = {"bookmark", "compress", "index-body", "maintain"}
+# searches timed by `rfc maintain` before and after tidying the database.
+MAINTAIN_TERMS = ("protocol", "http", "security", "dns", "mail", "ipv6")
+
+
+def echo_results(results, as_json):
+    """Print number and title of each result, or a JSON list of them."""
+
+    rows = [
+        {
+            "number": result.number,
+            "title": title_without_number(result.title),
+            "category": result.category,
+        }
+        for result in results
+    ]
+    if as_json:
+        click.echo(json.dumps(rows, indent=2))
+        return
+    for row in rows:
+        click.echo(f"RFC {row['number']} - {row['title']}")
+
+
+@click.group(invoke_without_command=True)
+@click.pass_context
+def cli(ctx):
+    """Search, read and bookmark RFC's offline.
+
+    Run without a command to use the interactive mode.
+    """
+
+    if ctx.invoked_subcommand is None:
+        from rfcpy.rfc import main
+
+        main()
+        return
+    if not os.path.exists(Config.DATABASE_PATH):
+        raise click.ClickException(
+            "Database not found, run `rfc` once to download the RFC's."
+        )
+    ctx.call_on_close(flush)
+    writes = ctx.invoked_subcommand in WRITE_COMMANDS
+    if writes:
+        open_database()
+    else:
+        open_read_only()
+    if not Bookmark.table_exists():
+        # databases from older releases are migrated once, read-write
+        open_database()
+        create_tables()
+        if not writes:
+            open_read_only()
+
+
+@cli.command()
+@click.argument("number", type=int)
+def get(number):
+    """Print the text of RFC NUMBER."""
+
+    try:
+        with span("query", query="get"):
+            rfc = queries.get_rfc(number)
+    except (DoesNotExist, OverflowError):
+        raise click.ClickException(f"RFC {number} not found.")
+    click.echo(rfc.text)
+
+
+def echo_body_results(phrase, limit, offset, as_json):
+    """Print a page of body search results with their matching snippets."""
+
+    if not DataBody.table_exists():
+        raise click.ClickException(
+            "RFC bodies are not indexed, run `rfc index-body` first."
+        )
+    with span("query", query="search_body"):
+        total, page = queries.search_body(phrase, limit, offset)
+        page = list(page)
+    rows = [
+        {
+            "number": result.number,
+            "title": title_without_number(result.title),
+            "snippet": " ".join(result.snippet.split()),
+        }
+        for result in page
+    ]
+    if as_json:
+        output = {"total": total, "offset": offset, "results": rows}
+        click.echo(json.dumps(output, indent=2))
+        return
+    click.echo(f"Showing {offset + 1}-{offset + len(rows)} of {total} matches")
+    for row in rows:
+        click.echo(f"RFC {row['number']} - {row['title']}")
+        click.echo(f"    {row['snippet']}")
+
+
+@cli.command()
+@click.argument("phrase", nargs=-1, required=True)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="Maximum results.",
+)
+@click.option(
+    "--offset",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Results to skip, for paging.",
+)
+@click.option("--body", is_flag=True, help="Search RFC bodies as well as titles.")
+@click.option("--json", "as_json", is_flag=True, help="Output results as JSON.")
+def search(phrase, limit, offset, body, as_json):
+    """Search RFC titles and categories for PHRASE."""
+
+    from rfcpy.helpers.utils import sanitize_inputs
+
+    phrase = sanitize_inputs(" ".join(phrase))
+    if not phrase.strip():
+        raise click.BadParameter("nothing to search for", param_hint="PHRASE")
+    try:
+        if body:
+            echo_body_results(phrase, limit, offset, as_json)
+            return
+        with span("query", query="search"):
+            results = queries.search_results(phrase, limit, offset)
+    except OperationalError as e:
+        # e.g. a bare AND, which FTS5 reads as an incomplete query
+        raise click.ClickException(f"Cannot search for {phrase!r}: {e}")
+    echo_results(results, as_json)
+
+
+@cli.command()
+@click.option("--tag", help="Only list bookmarks with this tag.")
+@click.option("--json", "as_json", is_flag=True, help="Output results as JSON.")
+def bookmarks(tag, as_json):
+    """List bookmarked RFC's."""
+
+    with span("query", query="bookmarks"):
+        results = list(queries.bookmarks(tag))
+    echo_results(results, as_json)
+
+
+@cli.command()
+@click.argument("numbers", nargs=-1, type=int, required=True)
+@click.option("--tag", "tags", multiple=True, help="Tag the bookmarks, repeatable.")
+@click.option("--note", default="", help="Note kept with the bookmarks.")
+@click.option("--remove", is_flag=True, help="Remove the bookmarks instead.")
+def bookmark(numbers, tags, note, remove):
+    """Bookmark RFC NUMBERS, or remove their bookmarks with --remove."""
+
+    if remove:
+        click.echo(f"{remove_bookmarks(numbers)} bookmarks removed.")
+    else:
+        click.echo(f"{add_bookmarks(numbers, tags, note)} bookmarks added.")
+
+
+@cli.command()
+@click.option(
+    "-n",
+    "limit",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Number of RFC's.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Output results as JSON.")
+def latest(limit, as_json):
+    """List the most recent RFC's."""
+
+    with span("query", query="latest"):
+        results = list(queries.latest(limit))
+    echo_results(results, as_json)
+
+
+@cli.command()
+@click.option(
+    "--algorithm",
+    type=click.Choice(["zlib", "lzma", "none"]),
+    default=lambda: Config.COMPRESSION or "none",
+    show_default="Config.COMPRESSION",
+    help="Compression to store RFC bodies with.",
+)
+def compress(algorithm):
+    """Rewrite stored RFC bodies with the chosen compression.
+
+    Set Config.COMPRESSION to the same value so RFC's added by later updates
+    are stored the same way.
+    """
+
+    Config.COMPRESSION = None if algorithm == "none" else algorithm
+    # migrate_compression commits on its own, VACUUM cannot run in a
+    # transaction
+    with db.connection_context():
+        rewritten = migrate_compression()
+        click.echo(f"{rewritten} RFC's rewritten, reclaiming free space...")
+        db.execute_sql("VACUUM")
+    click.echo("...Done!")
+
+
+@cli.command("index-body")
+def index_body():
+    """Build the full-text index of RFC bodies used by `rfc search --body`.
+
+    This stores another copy of every RFC, roughly doubling the database size.
+    Once built it is kept up to date by later updates.
+    """
+
+    with db:
+        indexed = build_body_index()
+    click.echo(f"{indexed} RFC's indexed.")
+
+
+def database_size():
+    """Bytes used by the database file and its WAL."""
+
+    paths = (Config.DATABASE_PATH, f"{Config.DATABASE_PATH}-wal")
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def search_latency(repeat=5):
+    """Median milliseconds taken by a search for each of MAINTAIN_TERMS, after
+    one untimed pass to warm the page cache."""
+
+    list(queries.search(" OR ".join(MAINTAIN_TERMS)))
+    samples = []
+    for _ in range(repeat):
+        for term in MAINTAIN_TERMS:
+            start = time.perf_counter()
+            list(queries.search(term))
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+@cli.command()
+@click.option("--vacuum", is_flag=True, help="Also reclaim free space, slow.")
+def maintain(vacuum):
+    """Optimize the search indexes and refresh query planner statistics.
+
+    Updates do this on their own, run it by hand after `rfc compress` or to
+    VACUUM the database with --vacuum.
+    """
+
+    size, latency = database_size(), search_latency()
+    with span("maintain"):
+        maintain_database(vacuum)
+    new_size, new_latency = database_size(), search_latency()
+    click.echo(f"Size: {size / 2**20:.1f}MB -> {new_size / 2**20:.1f}MB")
+    click.echo(f"Search latency: {latency:.2f}ms -> {new_latency:.2f}ms (median)")
+
+
+@cli.command()
+@click.option("--host", default=lambda: Config.SERVE_HOST, show_default="127.0.0.1")
+@click.option(
+    "--port", type=int, default=lambda: Config.SERVE_PORT, show_default="8080"
+)
+def serve(host, port):
+    """Answer lookups over HTTP with JSON, see rfcpy.server for the endpoints."""
+
+    from rfcpy.server import RFCServer
+
+    server = RFCServer((host, port))
+    click.echo(f"Serving RFC's on http://{host}:{server.server_port}/ (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,96 @@
+"""Least recently used cache bounded by the size of its values in bytes.
+
+Used by rfcpy.queries to keep opened RFC's and search results in memory for
+long running sessions. Entries are stored with the database generation they
+were read at, see fn:models.generation, so an update from any process empties
+the cache and values read before it are never returned after it.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU cache holding at most max_bytes of values.
+
+    Sizes are given by the caller when a value is stored, a value larger than
+    the whole cache is not stored at all.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None, generation=None):
+        """The value stored for key, or default if there is none or it was
+        stored for a different generation."""
+
+        with self.lock:
+            try:
+                value, size, stored = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if stored != generation:
+                del self.entries[key]
+                self.bytes -= size
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size, generation=None):
+        """Store value, read from the database at generation, for key."""
+
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size, generation)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted, _) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def validate(self, generation):
+        """Empty the cache if generation differs from the one its entries
+        were read at. Any hashable value will do, e.g. (path, counter).
+
+        Only frees memory early, a value put by a thread which read it before
+        the change is still refused by fn:get for the new generation.
+        """
+
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.bytes = 0
+                self.generation = generation
+
+    def stats(self):
+        """Hit and miss counts, hit_rate is None before the first lookup."""
+
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
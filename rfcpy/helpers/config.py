@@ -11,5 +11,76 @@ class Config:
     DATABASE_PATH = os.path.join(ROOT_FOLDER, DATABASE)
     URL = "https://www.rfc-editor.org/in-notes/tar/RFC-all.tar.gz"
     FILENAME = URL.split("/")[-1]
+    INDEX_URL = "https://www.rfc-editor.org/rfc/rfc-index.txt"
+    RFC_URL = "https://www.rfc-editor.org/rfc/rfc{number}.txt"
     CONFIG_FILE = os.path.join(ROOT_FOLDER, "rfc.cfg")
     TESTS_FOLDER = os.path.join(ROOT_FOLDER, "tests")
+    # rows per insert_many, 6 columns (ingest.ROW_FIELDS) * 100 rows is 600
+    # parameters, below SQLite's 999 host parameter limit on older builds.
+    BATCH_SIZE = 100
+    # page cache used while bulk loading, negative values are in KiB (64MB).
+    BULK_CACHE_SIZE = -65536
+    # set on every connection: reads go through a memory map of the file
+    # (256MB), each connection keeps a page cache (negative is KiB, 16MB) and
+    # waits up to BUSY_TIMEOUT ms for another connection's write to finish.
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE = -16384
+    BUSY_TIMEOUT = 5000
+    # connections shared by the threads of a process, a thread asking for one
+    # when all are checked out waits up to POOL_TIMEOUT seconds. Connections
+    # older than POOL_STALE_TIMEOUT seconds are closed instead of reused, so
+    # a long running `rfc serve` reopens a database file replaced under it.
+    POOL_SIZE = 16
+    POOL_TIMEOUT = 10
+    POOL_STALE_TIMEOUT = 60
+    # processes used to parse documents during ingest, 1 parses serially.
+    WORKERS = os.cpu_count() or 1
+    # compress RFC bodies on disk with "zlib" or "lzma", None stores plain text.
+    # Run `rfc compress` after changing to rewrite rows already stored.
+    COMPRESSION = None
+    # build the full-text index over RFC bodies (DataBody) when the database is
+    # created. It stores another copy of every body, roughly doubling its size.
+    # `rfc index-body` builds it for an existing database.
+    BODY_INDEX = False
+    # FTS5 merge tuning applied by `rfc maintain` and after updates. automerge
+    # is how many segments of a level are merged at once (FTS5 default 4),
+    # crisismerge how many a level may hold before a write must merge them
+    # (default 16). Higher values make writes cheaper between maintenance runs.
+    FTS_AUTOMERGE = 8
+    FTS_CRISISMERGE = 16
+    # memory for RFC's and search results kept by rfcpy.queries between
+    # lookups, 32MB. 0 disables the cache.
+    CACHE_BYTES = 32 * 1024 * 1024
+    # address `rfc serve` listens on.
+    SERVE_HOST = "127.0.0.1"
+    SERVE_PORT = 8080
+    # connections kept open per host by the shared HTTP session.
+    HTTP_POOL_SIZE = 10
+    # retries, with exponential backoff, of failed connections and 429/5xx.
+    HTTP_RETRIES = 3
+    HTTP_BACKOFF = 0.5
+    # seconds to wait for a server to connect or send data.
+    HTTP_TIMEOUT = 30
+    # ETag/Last-Modified of fetched URLs, sent back so unchanged files cost a 304.
+    VALIDATORS_FILE = os.path.join(ROOT_FOLDER, "validators.json")
+    # parallel HTTP Range requests used to download the tarball, 1 downloads it
+    # in a single stream. Either way an interrupted download is resumed.
+    DOWNLOAD_WORKERS = 4
+    # bytes read from the socket per write, 1MB.
+    DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+    # times a dropped connection is resumed before giving up.
+    DOWNLOAD_ATTEMPTS = 3
+    # download chunks buffered between the download and untar stages of an
+    # update, 16MB at the default chunk size.
+    PIPELINE_BUFFER = 16
+    # documents or rows buffered between the later stages of an update.
+    PIPELINE_DEPTH = 256
+    # expected sha256 hex digest of the tarball, checked after download if set.
+    TARBALL_SHA256 = None
+    # metrics sinks written at the end of an update or command, see
+    # helpers.instrumentation. METRICS_LOG logs a summary at INFO level,
+    # METRICS_JSON and METRICS_TEXTFILE are paths for a JSON snapshot and a
+    # Prometheus textfile.
+    METRICS_LOG = False
+    METRICS_JSON = None
+    METRICS_TEXTFILE = None
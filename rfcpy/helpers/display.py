@@ -7,6 +7,13 @@ def clear_screen():
     os.system("clear")
 
 
+def title_without_number(title):
+    """Titles are stored as '8446 The Transport Layer...', drop the number."""
+
+    number, _, rest = title.partition(" ")
+    return rest if number.isdigit() else title
+
+
 class Color:
     HEADER = "\033[95m"
     IMPORTANT = "\33[35m"
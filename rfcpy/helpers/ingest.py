@@ -0,0 +1,763 @@
+"""Functions which parse RFC's and write them to the database.
+
+Only imported when the database is created or updated.
+"""
+
+import contextlib
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tarfile
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+from peewee import IntegrityError, chunked
+from requests.exceptions import ChunkedEncodingError, ConnectionError
+
+from rfcpy.helpers.config import Config
+from rfcpy.helpers.instrumentation import inc, span, timed
+from rfcpy.helpers.network import (download_rfc_tar, fetch_index, fetch_rfcs,
+                                   forget_validators, stream_rfc_tar)
+from rfcpy.helpers.pipeline import Pipeline, PipelineAborted, PipeReader, feed
+from rfcpy.helpers.utils import get_categories
+from rfcpy.models import (Data, DataBody, bump_generation, create_tables,
+                          maintain_database, shadow_database, writer)
+
+RFC_FILENAME = re.compile(r"^rfc(\d+)\.txt$")
+
+
+class IndexEntry(
+    namedtuple(
+        "IndexEntry",
+        "number title authors date obsoletes obsoleted_by updates updated_by status",
+    )
+):
+    """A single record parsed from rfc-index.txt."""
+
+    __slots__ = ()
+
+    @property
+    def heading(self):
+        """Title as written to the database, prefixed with the RFC number."""
+        return f"{self.number:04d} {self.title}"
+
+    @property
+    def published(self):
+        """Publication date. Only April 1st RFC's give a day in the index, the
+        first of the month is used for everything else."""
+        if self.date is None:
+            return None
+        parts = self.date.split()
+        day = int(parts[0]) if len(parts) == 3 else 1
+        month = datetime.strptime(" ".join(parts[-2:]), "%B %Y")
+        return month.date().replace(day=day)
+
+
+MONTHS = (
+    "January|February|March|April|May|June|July|August|September|October"
+    "|November|December"
+)
+
+
+INDEX_DATE = re.compile(rf"((?:\d{{1,2}} )?(?:{MONTHS}) \d{{4}})\.")
+
+
+INDEX_FIELD = re.compile(
+    r"\((Format|Obsoletes|Obsoleted by|Updates|Updated by|Also|Status|Stream"
+    r"|DOI):? ([^)]*)\)"
+)
+
+
+INDEX_AUTHOR = r"(?:[A-Z][a-z]{0,2}\.[ -]?)+(?:St\. )?[^,.]+(?:, Ed\.?)?"
+
+
+INDEX_AUTHORS = re.compile(rf"{INDEX_AUTHOR}(?:, {INDEX_AUTHOR})*")
+
+
+def _split_title_authors(head):
+    """Split 'Title. A. Author, B. Author' on the first '. ' which is followed
+    only by author names; titles may contain full stops (Version 1.3)."""
+
+    head = head.strip()
+    if head.endswith("."):
+        head = head[:-1]
+    for match in re.finditer(r"\. ", head):
+        if INDEX_AUTHORS.fullmatch(head[match.end() :]):
+            return head[: match.start()], head[match.end() :]
+    title, _, authors = head.rpartition(". ")
+    if not title:
+        return authors, ""
+    return title, authors
+
+
+def parse_index_entry(block):
+    """Parse one rfc-index.txt record into an IndexEntry.
+
+    :arg block: the lines of a record, starting with the RFC number.
+
+    :return IndexEntry or None if the block is not an RFC record.
+    """
+
+    match = re.match(r"(\d{4,5}) (.*)", " ".join(block.split()))
+    if match is None:
+        return None
+    number, rest = int(match.group(1)), match.group(2)
+    date = INDEX_DATE.search(rest)
+    if date:
+        head, tail = rest[: date.start()], rest[date.end() :]
+    else:
+        head, tail = rest, ""
+    title, authors = _split_title_authors(head)
+    fields = {key: value.strip() for key, value in INDEX_FIELD.findall(tail)}
+
+    def numbers(key):
+        return tuple(int(n) for n in re.findall(r"RFC(\d+)", fields.get(key, "")))
+
+    return IndexEntry(
+        number=number,
+        title=title,
+        authors=tuple(a for a in re.split(r", (?!Ed\.?)", authors) if a),
+        date=date.group(1) if date else None,
+        obsoletes=numbers("Obsoletes"),
+        obsoleted_by=numbers("Obsoleted by"),
+        updates=numbers("Updates"),
+        updated_by=numbers("Updated by"),
+        status=fields.get("Status"),
+    )
+
+
+def get_title_index(index_text=None):
+    """Parses every record in rfc-index.txt in a single pass allowing the
+    title to be looked up by RFC number in constant time.
+
+    :arg index_text: contents of rfc-index.txt, if None the extracted copy in
+                     Config.STORAGE_PATH is read instead.
+
+    :return dict of {number: IndexEntry}
+    """
+
+    if index_text is None:
+        with open(os.path.join(Config.STORAGE_PATH, "rfc-index.txt"), "r") as f:
+            index_text = f.read()
+    index = {}
+    for block in re.split(r"\n\s*\n", index_text):
+        entry = parse_index_entry(block)
+        if entry is not None:
+            index[entry.number] = entry
+    return index
+
+
+def strip_extensions():
+    """Strips away all non txt files from directory listing.
+
+    :return clean_list: generator of files with unwanted items removed
+    """
+    # This continually breaks as the IETF adds more file types
+    # let's look to make it find only postitives (txt) rather
+    # parse out negatives (non-txt).
+    _, _, files = next(os.walk(Config.STORAGE_PATH))
+    dirty_extensions = [
+        "a.txt",
+        "rfc-index.txt",
+        ".pdf",
+        ".ps",
+        ".ta",
+        ".html",
+        ".json",
+    ]
+    clean_list = (x for x in files if not any(xs in x for xs in dirty_extensions))
+    return clean_list
+
+
+def iter_rfc_files():
+    """Reads each extracted RFC text file in Config.STORAGE_PATH.
+
+    :return generator of (number, text) tuples, text is stripped of whitespace.
+    """
+
+    for file in strip_extensions():
+        with open(os.path.join(Config.STORAGE_PATH, file), errors="ignore") as f:
+            yield file.strip(".txt").strip("rfc"), f.read().strip()
+
+
+def iter_tar_rfcs(tar_path=None, decode=True, fileobj=None):
+    """Streams rfcNNNN.txt members straight out of the tarball without writing
+    anything to disk. Every other member (pdf, ps, html, json, index) is skipped.
+
+    :arg tar_path: location of RFC-all.tar.gz, defaults to Config.ROOT_FOLDER
+    :arg decode: if False the raw bytes are yielded and decoding is left to
+                 fn:parse_document, allowing it to happen in worker processes.
+    :arg fileobj: read the tarball from this file-like object instead
+
+    :return generator of (number, text) tuples, text is stripped of whitespace.
+    """
+
+    if tar_path is None and fileobj is None:
+        tar_path = os.path.join(Config.ROOT_FOLDER, Config.FILENAME)
+    with tarfile.open(tar_path, mode="r|gz", fileobj=fileobj) as tar:
+        for member in tar:
+            match = RFC_FILENAME.match(os.path.basename(member.name))
+            if member.isfile() and match:
+                with tar.extractfile(member) as f:
+                    text = f.read()
+                if decode:
+                    text = text.decode("utf-8", errors="ignore").strip()
+                yield match.group(1), text
+            # stream mode still caches every TarInfo, drop them to keep memory flat
+            tar.members = []
+
+
+def read_tar_index(tar_path=None):
+    """Streams through the tarball until rfc-index.txt is found.
+
+    :arg tar_path: location of RFC-all.tar.gz, defaults to Config.ROOT_FOLDER
+
+    :return contents of rfc-index.txt or None if the tarball does not have one.
+    """
+
+    if tar_path is None:
+        tar_path = os.path.join(Config.ROOT_FOLDER, Config.FILENAME)
+    with tarfile.open(tar_path, mode="r|gz") as tar:
+        for member in tar:
+            if os.path.basename(member.name) == "rfc-index.txt":
+                with tar.extractfile(member) as f:
+                    return f.read().decode("utf-8", errors="ignore")
+            tar.members = []
+    return None
+
+
+def remove_rfc_files():
+    """Removes of downloaded and unzipped RFC files and folders after being
+    written to the database."""
+
+    shutil.rmtree(Config.STORAGE_PATH)
+
+
+def database_is_populated():
+    """True if a previous update has written RFC's to the database."""
+
+    return (
+        os.path.exists(Config.DATABASE_PATH)
+        and Data.table_exists()
+        and Data.select().exists()
+    )
+
+
+def uncompress_tar():
+    """Uncompress the downloaded tarball into the folder and then delete it."""
+
+    if os.path.exists(Config.STORAGE_PATH):
+        remove_rfc_files()
+    file_location = os.path.join(Config.ROOT_FOLDER, Config.FILENAME)
+    print("..uncompressing tar.gz...")
+    with tarfile.open(os.path.join(Config.ROOT_FOLDER, Config.FILENAME)) as f:
+        f.extractall(Config.STORAGE_PATH)
+    os.remove(file_location)
+    print("..Done!")
+
+
+@timed("stream_tar_to_db")
+def stream_tar_to_db():
+    """Write the tarball straight into the database, skipping fn:uncompress_tar.
+
+    Members are read from the gzip stream one at a time so no scratch space is
+    needed and memory use does not grow with the size of the archive. The
+    tarball is deleted once all files have been written.
+    """
+
+    file_location = os.path.join(Config.ROOT_FOLDER, Config.FILENAME)
+    print("..streaming tar.gz into database...")
+    index_text = read_tar_index(file_location)
+    if index_text is None:
+        print("[!] rfc-index.txt missing from tar.gz, titles unavailable [!]")
+        index_text = ""
+    documents = iter_tar_rfcs(file_location, decode=False)
+    write_to_db(documents, get_title_index(index_text))
+    os.remove(file_location)
+
+
+@timed("untar")
+def untar(chunks, documents):
+    """Pipeline stage, puts (number, bytes) documents read out of a pipe of
+    tar.gz chunks."""
+
+    for document in iter_tar_rfcs(decode=False, fileobj=PipeReader(chunks)):
+        documents.put(document)
+    documents.close()
+
+
+@timed("parse")
+def parse(documents, rows, title_index, existing, workers):
+    """Pipeline stage, puts the rows built from a pipe of documents."""
+
+    for row in build_rows(documents, title_index, workers, existing):
+        rows.put(row)
+    rows.close()
+
+
+@timed("pipeline_to_db")
+def pipeline_to_db(chunks, title_index, batch_size=None, workers=None):
+    """Write a tar.gz, read as an iterable of byte chunks, to the database with
+    every stage of the update running at once.
+
+    Reading the chunks (usually the download), gunzip and untar, and parsing
+    each run in their own thread joined by bounded queues, while this thread
+    commits batches as rows arrive. An update then takes about as long as its
+    slowest stage rather than the sum of them. Nothing is committed if any
+    stage fails.
+
+    :arg chunks: iterable of bytes, e.g. fn:network.stream_rfc_tar
+    :arg title_index: dict from fn:get_title_index
+    :arg batch_size: rows per insert_many, defaults to Config.BATCH_SIZE
+    :arg workers: parsing processes, defaults to Config.WORKERS
+
+    :return tuple of rows inserted and seconds taken.
+    """
+
+    create_tables()
+    existing = {number for number, in Data.select(Data.number).tuples()}
+    pipeline = Pipeline()
+    raw = pipeline.pipe(Config.PIPELINE_BUFFER)
+    documents = pipeline.pipe(Config.PIPELINE_DEPTH)
+    rows = pipeline.pipe(Config.PIPELINE_DEPTH)
+    pipeline.start(feed, chunks, raw)
+    pipeline.start(untar, raw, documents)
+    pipeline.start(parse, documents, rows, title_index, existing, workers)
+    try:
+        result = bulk_insert(rows, batch_size)
+    except PipelineAborted:
+        result = None  # the failed stage's error is raised by join
+    except BaseException:
+        pipeline.abort()
+        raise
+    finally:
+        pipeline.join()
+    return result
+
+
+def download_to_db():
+    """Download the tarball straight into the database, see fn:pipeline_to_db.
+
+    Nothing is written to disk besides the database, which is built in a
+    shadow file and only swapped in once complete, see
+    fn:models.shadow_database. If the connection drops the resumable
+    fn:network.download_rfc_tar finishes the job instead.
+    """
+
+    print("..streaming RFC's into database...")
+    title_index = get_title_index(fetch_index())
+    try:
+        with shadow_database():
+            inserted, elapsed = pipeline_to_db(stream_rfc_tar(), title_index)
+    except (ConnectionError, ChunkedEncodingError):
+        print("[!] Connection lost, resuming the download to disk [!]")
+        download_rfc_tar()
+        stream_tar_to_db()
+        return
+    rate = inserted / elapsed if elapsed else 0
+    click.echo(f"..{inserted} rows written in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    print("...Done!")
+
+
+@timed("write_to_db")
+def write_to_db(documents=None, title_index=None, batch_size=None, workers=None):
+    """Write the contents of files to sqlite database.
+
+    function will run each time the database is updated. Relies on RFC number
+    as the Primary Key to issue Unique Key Constraint which prohibits duplicate
+    RFC's being written to DB.
+
+    :arg documents: iterable of (number, text) tuples, defaults to reading the
+                    files extracted by fn:uncompress_tar
+    :arg title_index: dict from fn:get_title_index, defaults to the extracted
+                      rfc-index.txt
+    :arg batch_size: rows per insert_many, defaults to Config.BATCH_SIZE
+    :arg workers: parsing processes, defaults to Config.WORKERS
+
+    Writes the following to models.Data (indexed into DataIndex by triggers)
+        :arg number: RFC number taken from filename <rfc1918.txt>
+        :arg title: RFC Title taken from rfc-index.txt and mapped against number
+        :arg text: body of the document parsed for reading in terminal
+        :arg category: category type taken from document
+
+    The database is rebuilt in a shadow file and swapped in once complete,
+    see fn:models.shadow_database, so readers never see a half written table
+    and a failed write leaves the old database and the text files in place.
+
+    Removes folder containing all text files post write.
+    """
+
+    print("..Beginning database writes..")
+    if title_index is None:
+        title_index = get_title_index()
+    if documents is None:
+        documents = iter_rfc_files()
+    with shadow_database():
+        rows = build_rows(documents, title_index, workers)
+        inserted, elapsed = bulk_insert(rows, batch_size)
+    rate = inserted / elapsed if elapsed else 0
+    click.echo(f"..{inserted} rows written in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    if os.path.exists(Config.STORAGE_PATH):
+        remove_rfc_files()
+    print("Successfully finished importing all files to database.")
+    print("Now removing unnecessary files from disk....")
+    print("...Done!")
+
+
+def checksum(text):
+    """sha1 hex digest of an RFC body, used to detect changed documents."""
+
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+ROW_FIELDS = [
+    Data.number,
+    Data.title,
+    Data.text,
+    Data.category,
+    Data.checksum,
+    Data.published,
+]
+
+
+def make_row(number, entry, text):
+    """Build the row for one RFC, the values are in the order of ROW_FIELDS."""
+
+    return (
+        number,
+        entry.heading,
+        text,
+        get_categories(text),
+        checksum(text),
+        entry.published,
+    )
+
+
+def parse_document(document, title_index):
+    """Decode one (number, text) document and build its database row.
+
+    :arg document: (number, text) tuple, text may be str or raw bytes
+    :arg title_index: dict from fn:get_title_index
+
+    :return row from fn:make_row or None if the file is not a known RFC.
+    """
+
+    number, text = document
+    try:
+        number = int(number)
+    except ValueError as e:
+        logging.debug(f"{e}: hit at RFC {number}")
+        return None
+    entry = title_index.get(number)
+    if entry is None:
+        logging.debug(f"Skipping RFC {number}, not found in rfc-index.txt")
+        return None
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="ignore")
+    return make_row(number, entry, text.strip())
+
+
+_worker_title_index = None
+
+
+def _init_worker(title_index):
+    global _worker_title_index
+    _worker_title_index = title_index
+
+
+def _parse_chunk(documents):
+    return [parse_document(document, _worker_title_index) for document in documents]
+
+
+def _worker_context():
+    """Start method for parsing processes.
+
+    Workers are started from the parse thread of fn:pipeline_to_db while the
+    download and untar threads are running, and a process forked from a
+    multithreaded one can deadlock on a lock another thread held. Where
+    available they are forked from a single threaded forkserver instead.
+    """
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context()
+
+
+def parse_in_parallel(documents, title_index, workers, chunk_size=64):
+    """Run fn:parse_document across a pool of worker processes.
+
+    Documents are submitted in chunks and at most two chunks per worker are
+    in flight, so a streamed tarball is never read far ahead of the writer.
+    Results are yielded in submission order, identical to a serial run.
+
+    :arg documents: iterable of (number, text) tuples
+    :arg title_index: dict from fn:get_title_index, sent once to each worker
+    :arg workers: number of worker processes
+    :arg chunk_size: documents sent to a worker per task
+
+    :return generator of rows (or None for skipped documents).
+    """
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_worker_context(),
+        initializer=_init_worker,
+        initargs=(title_index,),
+    ) as pool:
+        pending = deque()
+        for chunk in chunked(documents, chunk_size):
+            pending.append(pool.submit(_parse_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def build_rows(documents, title_index, workers=None, existing=None):
+    """Turn (number, text) documents into rows ready for fn:bulk_insert.
+
+    RFC's already in the database are skipped, as are files without a usable
+    number or title, which would otherwise raise an IntegrityError mid batch.
+    Parsing is spread over worker processes while this process keeps sole
+    ownership of the database connection.
+
+    :arg documents: iterable of (number, text) tuples
+    :arg title_index: dict from fn:get_title_index
+    :arg workers: parsing processes, defaults to Config.WORKERS, 1 is serial
+    :arg existing: set of RFC numbers to skip, defaults to those in the
+                   database. Passing it lets rows be built off the thread
+                   holding the database connection.
+
+    :return generator of row tuples from fn:make_row.
+    """
+
+    workers = workers or Config.WORKERS
+    if existing is None:
+        existing = {number for number, in Data.select(Data.number).tuples()}
+    if workers > 1:
+        rows = parse_in_parallel(documents, title_index, workers)
+    else:
+        rows = (parse_document(document, title_index) for document in documents)
+    for row in rows:
+        inc("files_parsed")
+        if row is None or row[0] in existing:
+            continue
+        existing.add(row[0])
+        yield row
+
+
+@contextlib.contextmanager
+def bulk_load_pragmas(database=None):
+    """Relax durability while bulk loading and restore the settings after.
+
+    synchronous=OFF skips the fsync per commit, a larger cache_size keeps the
+    FTS5 b-tree pages hot and temp_store=MEMORY keeps sort scratch off disk.
+    Safe because an interrupted load is simply rebuilt on the next update.
+    """
+
+    database = database or Data._meta.database
+    pragmas = {
+        "synchronous": 0,
+        "cache_size": Config.BULK_CACHE_SIZE,
+        "temp_store": 2,
+    }
+    previous = {name: database.pragma(name) for name in pragmas}
+    for name, value in pragmas.items():
+        database.pragma(name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            database.pragma(name, value)
+
+
+def _insert_batch(batch, body_index=False):
+    Data.insert_many(batch, fields=ROW_FIELDS).execute()
+    if body_index:
+        DataBody.insert_many(
+            [row[:3] for row in batch],
+            fields=[DataBody.rowid, DataBody.title, DataBody.text],
+        ).execute()
+
+
+def bulk_insert(rows, batch_size=None):
+    """Write rows to models.Data using insert_many, triggers index them in
+    models.DataIndex. models.DataBody is written too if it has been built.
+
+    All batches share one outer transaction, each batch runs in a savepoint so
+    a batch raising an IntegrityError is retried row by row and only the
+    offending rows are dropped.
+
+    :arg rows: iterable of row tuples from fn:make_row
+    :arg batch_size: rows per insert, defaults to Config.BATCH_SIZE
+
+    :return tuple of rows inserted and seconds taken.
+    """
+
+    batch_size = batch_size or Config.BATCH_SIZE
+    database = Data._meta.database
+    body_index = DataBody.table_exists()
+    inserted = 0
+    start = time.perf_counter()
+    with bulk_load_pragmas(database), writer(database):
+        for batch in chunked(rows, batch_size):
+            try:
+                with database.atomic():
+                    _insert_batch(batch, body_index)
+                inserted += len(batch)
+            except IntegrityError:
+                for row in batch:
+                    try:
+                        with database.atomic():
+                            _insert_batch([row], body_index)
+                        inserted += 1
+                    except IntegrityError as e:
+                        inc("integrity_errors_skipped")
+                        logging.debug(f"Integrity Error: {e} Raised at {row[0]}")
+        if inserted:
+            bump_generation(database)
+    inc("rows_inserted", inserted)
+    return inserted, time.perf_counter() - start
+
+
+def find_stale_rfcs(title_index):
+    """Compare the database against rfc-index.txt.
+
+    :arg title_index: dict from fn:get_title_index
+
+    :return tuple of (missing, changed, revised). missing is a list of RFC
+            numbers in the index but not in the database, whether newly
+            published or not fetched by an earlier update, changed is a dict
+            of {number: IndexEntry} for local RFC's whose title or
+            publication date differs from the index. revised lists those of
+            changed whose title differs and whose text was stored with a
+            checksum, their text may have been revised too. Rows written by
+            older releases have no checksum or date and are only corrected
+            from the index, fetching them again would download every RFC.
+    """
+
+    local = {
+        number: (title, published, digest)
+        for number, title, published, digest in Data.select(
+            Data.number, Data.title, Data.published, Data.checksum
+        ).tuples()
+    }
+    missing, changed, revised = [], {}, []
+    for number, entry in sorted(title_index.items()):
+        if entry.title == "Not Issued":
+            continue
+        if number not in local:
+            missing.append(number)
+            continue
+        title, published, digest = local[number]
+        if (title, published) != (entry.heading, entry.published):
+            changed[number] = entry
+            if title != entry.heading and digest is not None:
+                revised.append(number)
+    return missing, changed, revised
+
+
+def upsert_rows(rows):
+    """Insert new rows and rewrite rows whose checksum has changed.
+
+    :arg rows: iterable of row tuples from fn:make_row
+
+    :return number of rows inserted or updated.
+    """
+
+    written = 0
+    body_index = DataBody.table_exists()
+    with writer():
+        for row in rows:
+            number, title, text, category, digest, published = row
+            current = Data.get_or_none(Data.number == number)
+            if current is None:
+                _insert_batch([row], body_index)
+            elif current.checksum != digest or current.title != title:
+                Data.update(
+                    title=title,
+                    text=text,
+                    category=category,
+                    checksum=digest,
+                    published=published,
+                ).where(Data.number == number).execute()
+                if body_index:
+                    DataBody.update(title=title, text=text).where(
+                        DataBody.rowid == number
+                    ).execute()
+            else:
+                continue
+            written += 1
+        if written:
+            bump_generation()
+    inc("rows_upserted", written)
+    return written
+
+
+@timed("incremental_update")
+def incremental_update():
+    """Bring an existing database up to date without the full tarball.
+
+    Only rfc-index.txt, the RFC's it lists which are not in the database and
+    those whose title changed in it are downloaded, see fn:find_stale_rfcs.
+    Changed entries are corrected in place and refetched documents are only
+    rewritten when the checksum of their text differs.
+    The search index is then tidied with fn:models.maintain_database.
+
+    The index is fetched conditionally, if it has not changed since the last
+    update the server answers 304 and nothing else is done.
+
+    :return False if the index was unchanged, otherwise True.
+    """
+
+    create_tables()
+    print("..checking rfc-index.txt for changes..")
+    index_text = fetch_index(conditional=True)
+    if index_text is None:
+        print("...rfc-index.txt unchanged, already up to date!")
+        return False
+    try:
+        apply_index(get_title_index(index_text))
+    except BaseException:
+        # the saved validators would hide this index from the next update
+        forget_validators(Config.INDEX_URL)
+        raise
+    with span("maintain"):
+        maintain_database()
+    return True
+
+
+def apply_index(title_index):
+    """Correct changed entries and write the missing RFC's listed in
+    title_index, see fn:find_stale_rfcs.
+
+    :arg title_index: dict from fn:get_title_index
+    """
+
+    missing, changed, revised = find_stale_rfcs(title_index)
+    body_index = DataBody.table_exists()
+    with writer():
+        for number, entry in changed.items():
+            Data.update(title=entry.heading, published=entry.published).where(
+                Data.number == number
+            ).execute()
+            if body_index:
+                DataBody.update(title=entry.heading).where(
+                    DataBody.rowid == number
+                ).execute()
+        if changed:
+            bump_generation()
+    numbers = sorted([*missing, *revised])
+    rows = (
+        make_row(number, title_index[number], text)
+        for number, text in fetch_rfcs(numbers)
+    )
+    written = upsert_rows(rows)
+    print(f"..{written} RFC's written and {len(changed)} index entries corrected.")
+    print("...Done!")
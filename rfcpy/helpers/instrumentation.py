@@ -0,0 +1,290 @@
+"""Spans, counters and histograms showing where update and search time goes.
+
+Metrics are collected in memory by REGISTRY and written out by sinks when
+fn:flush is called, at the end of an update or command. The sinks used are
+set in Config: METRICS_LOG logs a summary, METRICS_JSON and METRICS_TEXTFILE
+name files to write a JSON snapshot and a Prometheus textfile to, the latter
+for node_exporter's textfile collector.
+
+    with span("write_to_db"):
+        ...
+    inc("rows_inserted", len(batch))
+    observe("query_seconds", elapsed, query="search")
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from rfcpy.helpers.config import Config
+
+logger = logging.getLogger("rfcpy.metrics")
+
+# histogram bucket upper bounds in seconds, +Inf is implied.
+BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    300,
+)
+
+
+class Histogram:
+    """Bucketed distribution of observed values, as Prometheus keeps them."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q quantile, None if empty."""
+
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound)] including +Inf."""
+
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Registry:
+    """Thread-safe store of counters and histograms keyed by name and labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, amount=1, labels=()):
+        with self.lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        with self.lock:
+            key = (name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def snapshot(self):
+        """Plain dict of every metric, see fn:JSONSink for the layout."""
+
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "buckets": histogram.cumulative(),
+                }
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+REGISTRY = Registry()
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Add amount to the counter name."""
+
+    REGISTRY.inc(name, amount, _labels(labels))
+
+
+def observe(name, value, **labels):
+    """Record value in the histogram name."""
+
+    REGISTRY.observe(name, value, _labels(labels))
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the block, recording it in the histogram <name>_seconds."""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(f"{name}_seconds", elapsed, **labels)
+        logger.debug(f"{name} {labels or ''} took {elapsed:.4f}s")
+
+
+def timed(name):
+    """Decorator running the function inside span(name)."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _write_atomically(path, text):
+    """Replace path in one step so readers never see a partial file."""
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+
+def _format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
+
+
+class LogSink:
+    """Logs one line per metric."""
+
+    def __init__(self, level=logging.INFO):
+        self.level = level
+
+    def write(self, snapshot):
+        for counter in snapshot["counters"]:
+            labels = _format_labels(counter["labels"])
+            logger.log(self.level, f"{counter['name']}{labels} {counter['value']}")
+        for histogram in snapshot["histograms"]:
+            labels = _format_labels(histogram["labels"])
+            logger.log(
+                self.level,
+                f"{histogram['name']}{labels} count={histogram['count']} "
+                f"sum={histogram['sum']:.4f} p50<={histogram['p50']} "
+                f"p95<={histogram['p95']}",
+            )
+
+
+class JSONSink:
+    """Writes the snapshot to a JSON file, replaced on every flush."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, snapshot):
+        import json
+
+        snapshot = dict(snapshot, time=time.time())
+        _write_atomically(self.path, json.dumps(snapshot, indent=2, default=str))
+
+
+class PrometheusSink:
+    """Writes the Prometheus text format for node_exporter's textfile collector.
+
+    Metric names are prefixed with rfcpy_ and counters end in _total.
+    """
+
+    def __init__(self, path, prefix="rfcpy_"):
+        self.path = path
+        self.prefix = prefix
+
+    def write(self, snapshot):
+        lines, typed = [], set()
+        for counter in snapshot["counters"]:
+            name = f"{self.prefix}{counter['name']}_total"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(
+                f"{name}{_format_labels(counter['labels'])} {counter['value']}"
+            )
+        for histogram in snapshot["histograms"]:
+            name = f"{self.prefix}{histogram['name']}"
+            labels = histogram["labels"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in histogram["buckets"]:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels, le=le)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        _write_atomically(self.path, "\n".join(lines) + "\n")
+
+
+def configured_sinks():
+    """Sinks selected in Config."""
+
+    sinks = []
+    if Config.METRICS_LOG:
+        sinks.append(LogSink())
+    if Config.METRICS_JSON:
+        sinks.append(JSONSink(Config.METRICS_JSON))
+    if Config.METRICS_TEXTFILE:
+        sinks.append(PrometheusSink(Config.METRICS_TEXTFILE))
+    return sinks
+
+
+def flush(sinks=None):
+    """Write the current metrics to sinks, defaults to fn:configured_sinks.
+
+    Metrics keep accumulating afterwards, the files always hold the totals.
+    """
+
+    sinks = configured_sinks() if sinks is None else sinks
+    if not sinks:
+        return
+    snapshot = REGISTRY.snapshot()
+    for sink in sinks:
+        try:
+            sink.write(snapshot)
+        except OSError as e:
+            logger.warning(f"Could not write metrics with {sink}: {e}")
@@ -0,0 +1,345 @@
+"""Network functions used to download RFC's from the IETF."""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError, ConnectionError
+from urllib3.util.retry import Retry
+
+from rfcpy.helpers.config import Config
+from rfcpy.helpers.instrumentation import inc, timed
+
+_session = None
+
+
+def get_session():
+    """The requests.Session shared by every download.
+
+    Connections are kept alive and pooled, up to Config.HTTP_POOL_SIZE per
+    host, and failed connections or 429/5xx responses to GET and HEAD are
+    retried Config.HTTP_RETRIES times with exponential backoff.
+    """
+
+    global _session
+    if _session is None:
+        retries = Retry(
+            total=Config.HTTP_RETRIES,
+            backoff_factor=Config.HTTP_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+        )
+        adapter = HTTPAdapter(
+            pool_connections=Config.HTTP_POOL_SIZE,
+            pool_maxsize=Config.HTTP_POOL_SIZE,
+            max_retries=retries,
+        )
+        _session = requests.Session()
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+    return _session
+
+
+def load_validators():
+    """ETag and Last-Modified of previously fetched URLs, read from
+    Config.VALIDATORS_FILE.
+
+    :return dict of {url: {"etag": ..., "last_modified": ...}}
+    """
+
+    return _read_state(Config.VALIDATORS_FILE)
+
+
+def forget_validators(url):
+    """Drop the saved validators of url so its next fetch is unconditional."""
+
+    validators = load_validators()
+    if validators.pop(url, None) is not None:
+        _write_state(Config.VALIDATORS_FILE, validators)
+
+
+def conditional_get(url):
+    """GET url with If-None-Match/If-Modified-Since taken from the validator
+    cache. The validators of a 200 response are saved for next time.
+
+    :return response, or None if the server answered 304 Not Modified.
+    """
+
+    validators = load_validators()
+    saved = validators.get(url, {})
+    headers = {}
+    if saved.get("etag"):
+        headers["If-None-Match"] = saved["etag"]
+    if saved.get("last_modified"):
+        headers["If-Modified-Since"] = saved["last_modified"]
+    r = get_session().get(url, headers=headers, timeout=Config.HTTP_TIMEOUT)
+    if r.status_code == 304:
+        inc("not_modified")
+        return None
+    r.raise_for_status()
+    remote = remote_validators(r.headers)
+    if remote["etag"] or remote["last_modified"]:
+        validators[url] = {
+            "etag": remote["etag"],
+            "last_modified": remote["last_modified"],
+        }
+        _write_state(Config.VALIDATORS_FILE, validators)
+    return r
+
+
+def remote_validators(headers):
+    """ETag, Last-Modified and Content-Length of a response, used to tell
+    whether the remote file is the one a partial download was started from."""
+
+    length = headers.get("Content-Length")
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "length": int(length) if length is not None else None,
+    }
+
+
+def same_file(state, remote):
+    """True if the saved download state and remote validators describe the same
+    file. Without an ETag or Last-Modified nothing can be assumed."""
+
+    if not (remote["etag"] or remote["last_modified"]):
+        return False
+    return all(state.get(key) == value for key, value in remote.items())
+
+
+def _read_state(path):
+    """Saved download state, empty if there is none."""
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(path, state):
+    with open(path, "w") as f:
+        json.dump(state, f)
+
+
+def split_ranges(length, parts):
+    """Split length bytes into at most parts inclusive (start, end) ranges."""
+
+    size = -(-length // parts)  # ceiling division
+    return [(start, min(start + size, length) - 1) for start in range(0, length, size)]
+
+
+def fetch_range(session, url, part_path, start, end, chunk_size, progress):
+    """Download bytes start to end (inclusive, None for the rest of the file)
+    of url into part_path, resuming from whatever part_path already holds.
+
+    Dropped connections are resumed up to Config.DOWNLOAD_ATTEMPTS times. A
+    server that ignores the Range header is only accepted for a range
+    starting at 0, the part is then rewritten from the beginning.
+    """
+
+    expected = None if end is None else end - start + 1
+    for attempt in range(1, Config.DOWNLOAD_ATTEMPTS + 1):
+        done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if expected is not None and done >= expected:
+            return
+        headers = {}
+        if done or start or end is not None:
+            last = "" if end is None else end
+            headers["Range"] = f"bytes={start + done}-{last}"
+        try:
+            with session.get(
+                url, headers=headers, stream=True, timeout=Config.HTTP_TIMEOUT
+            ) as r:
+                r.raise_for_status()
+                if headers and r.status_code != 206:
+                    if start:
+                        raise OSError(f"{url} does not support Range requests")
+                    progress(-done)
+                    done = 0
+                with open(part_path, "ab" if done else "wb") as f:
+                    for chunk in r.iter_content(chunk_size):
+                        f.write(chunk)
+                        progress(len(chunk))
+                        inc("bytes_downloaded", len(chunk))
+            if expected is None or os.path.getsize(part_path) == expected:
+                return
+        except (ConnectionError, ChunkedEncodingError):
+            if attempt == Config.DOWNLOAD_ATTEMPTS:
+                raise
+        logging.info(f"Download of {url} interrupted, resuming (attempt {attempt})")
+    raise OSError(f"{url} ended early after {Config.DOWNLOAD_ATTEMPTS} attempts")
+
+
+def join_parts(part_paths, path):
+    """Concatenate the downloaded parts into path, removing each part.
+
+    :return sha256 hex digest of path.
+    """
+
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        for part_path in part_paths:
+            with open(part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(Config.DOWNLOAD_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+            os.remove(part_path)
+    return digest.hexdigest()
+
+
+@timed("download")
+def download_rfc_tar(url=None, path=None, workers=None, sha256=None):
+    """
+    Download all RFC's from IETF in a tar.gz for offline sorting.
+    Download progress is tracked via click.progressbar.
+
+    Parts are written next to the tarball and kept with the ETag and
+    Last-Modified of the remote file in <path>.json, so an interrupted
+    download resumes with HTTP Range requests as long as the remote file has
+    not changed. Servers which accept ranges and give a Content-Length are
+    downloaded in parallel ranges. A complete tarball with unchanged
+    validators is not downloaded again.
+
+    :arg url: defaults to Config.URL
+    :arg path: where to save the tarball, defaults to Config.ROOT_FOLDER
+    :arg workers: parallel ranges, defaults to Config.DOWNLOAD_WORKERS
+    :arg sha256: expected hex digest, defaults to Config.TARBALL_SHA256
+
+    :raises OSError: if the download is incomplete or fails the checksum.
+
+    :return True if the tarball was downloaded, False if already up to date.
+    """
+
+    url = url or Config.URL
+    path = path or os.path.join(Config.ROOT_FOLDER, Config.FILENAME)
+    workers = workers or Config.DOWNLOAD_WORKERS
+    sha256 = sha256 or Config.TARBALL_SHA256
+    state_path = f"{path}.json"
+    session = get_session()
+    head = session.head(url, allow_redirects=True, timeout=Config.HTTP_TIMEOUT)
+    head.raise_for_status()
+    remote = remote_validators(head.headers)
+    state = _read_state(state_path)
+    if not same_file(state, remote):
+        for part_path in state.get("parts", []):
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        state = dict(remote)
+    elif state.get("sha256") and os.path.exists(path):
+        print("..tar.gz is up to date, skipping download")
+        return False
+
+    length = remote["length"]
+    if not state.get("parts"):
+        ranged = head.headers.get("Accept-Ranges") == "bytes" and length
+        ranges = split_ranges(length, workers) if ranged else [(0, None)]
+        state["ranges"] = ranges
+        state["parts"] = [f"{path}.part{i}" for i in range(len(ranges))]
+    _write_state(state_path, state)
+
+    with click.progressbar(length=length or 0) as bar:
+        lock = threading.Lock()
+
+        def progress(size):
+            with lock:
+                bar.update(size)
+
+        for part_path in state["parts"]:
+            if os.path.exists(part_path):
+                progress(os.path.getsize(part_path))
+        with ThreadPoolExecutor(len(state["parts"])) as executor:
+            futures = [
+                executor.submit(
+                    fetch_range,
+                    session,
+                    url,
+                    part_path,
+                    start,
+                    end,
+                    Config.DOWNLOAD_CHUNK_SIZE,
+                    progress,
+                )
+                for part_path, (start, end) in zip(state["parts"], state["ranges"])
+            ]
+            for future in futures:
+                future.result()
+
+    digest = join_parts(state["parts"], path)
+    size = os.path.getsize(path)
+    if length is not None and size != length:
+        os.remove(path)
+        raise OSError(f"Downloaded {size} of {length} bytes from {url}")
+    if sha256 and digest != sha256.lower():
+        os.remove(path)
+        os.remove(state_path)
+        raise OSError(f"Checksum mismatch for {url}, expected {sha256} got {digest}")
+    state.update(parts=[], ranges=[], sha256=digest)
+    _write_state(state_path, state)
+    print("..\n[*] Download complete [*]")
+    return True
+
+
+def stream_rfc_tar(url=None):
+    """Download the tarball as a stream of chunks without saving it, for
+    fn:ingest.pipeline_to_db.
+
+    :arg url: defaults to Config.URL
+
+    :return generator of bytes, Config.DOWNLOAD_CHUNK_SIZE at a time.
+    """
+
+    url = url or Config.URL
+    with get_session().get(url, stream=True, timeout=Config.HTTP_TIMEOUT) as r:
+        r.raise_for_status()
+        length = int(r.headers.get("Content-Length", 0))
+        with click.progressbar(length=length) as bar:
+            for chunk in r.iter_content(Config.DOWNLOAD_CHUNK_SIZE):
+                bar.update(len(chunk))
+                inc("bytes_downloaded", len(chunk))
+                yield chunk
+
+
+def fetch_index(conditional=False):
+    """Download the current rfc-index.txt, a few MB rather than the tarball.
+
+    :arg conditional: send the validators from the last download, an
+                      unchanged index then costs a 304 response and no body.
+
+    :return contents of rfc-index.txt, None if conditional and unchanged.
+    """
+
+    if conditional:
+        r = conditional_get(Config.INDEX_URL)
+        return None if r is None else r.text
+    r = get_session().get(Config.INDEX_URL, timeout=Config.HTTP_TIMEOUT)
+    r.raise_for_status()
+    return r.text
+
+
+def fetch_rfcs(numbers):
+    """Download individual RFC text files over the shared keep-alive session.
+
+    :arg numbers: iterable of RFC numbers to fetch
+
+    :return generator of (number, text) tuples, RFC's without a txt
+            version are skipped.
+    """
+
+    session = get_session()
+    for number in numbers:
+        r = session.get(
+            Config.RFC_URL.format(number=number), timeout=Config.HTTP_TIMEOUT
+        )
+        if r.status_code == 404:
+            logging.debug(f"No txt version of RFC {number}")
+            continue
+        r.raise_for_status()
+        yield number, r.content.decode("utf-8", errors="ignore").strip()
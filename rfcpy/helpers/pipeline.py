@@ -0,0 +1,130 @@
+"""Threads joined by bounded queues, used to run the stages of an update
+concurrently.
+
+Each stage reads from the queue before it and writes to the queue after it.
+A full queue blocks its producer, so a slow stage holds back the ones ahead
+of it instead of letting work pile up in memory. If any stage fails the
+pipeline is aborted, every other stage stops at its next put or get and the
+error is raised from fn:Pipeline.join.
+"""
+
+import io
+import queue
+import threading
+
+# marks the end of the items in a Pipe.
+DONE = object()
+# seconds between checks for an aborted pipeline while blocked on a queue.
+POLL = 0.1
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+class Pipe:
+    """Bounded queue between two stages, iterate over it to consume."""
+
+    def __init__(self, maxsize, aborted):
+        self.queue = queue.Queue(maxsize)
+        self.aborted = aborted
+
+    def put(self, item):
+        while True:
+            if self.aborted.is_set():
+                raise PipelineAborted
+            try:
+                self.queue.put(item, timeout=POLL)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        """Tell the consumer no more items will follow."""
+
+        self.put(DONE)
+
+    def __iter__(self):
+        while True:
+            if self.aborted.is_set():
+                raise PipelineAborted
+            try:
+                item = self.queue.get(timeout=POLL)
+            except queue.Empty:
+                continue
+            if item is DONE:
+                return
+            yield item
+
+
+class PipeReader(io.RawIOBase):
+    """File-like view of a Pipe of byte chunks, e.g. for tarfile.open."""
+
+    def __init__(self, pipe):
+        self.chunks = iter(pipe)
+        self.chunk = b""
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.offset == len(self.chunk):
+            self.chunk = next(self.chunks, None)
+            self.offset = 0
+            if self.chunk is None:
+                self.chunk = b""
+                return 0
+        view = memoryview(self.chunk)[self.offset : self.offset + len(b)]
+        b[: len(view)] = view
+        self.offset += len(view)
+        return len(view)
+
+
+class Pipeline:
+    """Starts stages in threads and collects their errors."""
+
+    def __init__(self):
+        self.aborted = threading.Event()
+        self.threads = []
+        self.errors = []
+
+    def pipe(self, maxsize):
+        """A new bounded queue tied to this pipeline."""
+
+        return Pipe(maxsize, self.aborted)
+
+    def start(self, target, *args):
+        """Run target(*args) in its own thread."""
+
+        def run():
+            try:
+                target(*args)
+            except PipelineAborted:
+                pass
+            except BaseException as e:
+                self.errors.append(e)
+                self.aborted.set()
+
+        thread = threading.Thread(target=run, name=target.__name__, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def abort(self):
+        self.aborted.set()
+
+    def join(self):
+        """Wait for every stage, raising the first error if one failed."""
+
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+
+def feed(items, pipe):
+    """Stage putting each of items into pipe, e.g. chunks of a download."""
+
+    for item in items:
+        pipe.put(item)
+    pipe.close()
@@ -1,136 +1,60 @@
-"""Utility functions and classes used in RFC.py"""
+"""Utility functions and classes used in RFC.py
+
+Kept light on purpose, this module is imported on every start. Anything that
+touches the network or ingests the tarball lives in helpers.network and
+helpers.ingest which are only imported when updating the database.
+"""
 
-import configparser
-import functools
-import logging
 import os
 import re
-import shutil
-import tarfile
-import time
 from datetime import datetime, timedelta
 
-import click
-import requests
-from peewee import IntegrityError
-
 from rfcpy.helpers.config import Config
-from rfcpy.models import Data, DataIndex, create_tables, db
-
-logging.basicConfig(level=logging.INFO)
-
-
-def timer(function):
-    """
-    Timer decorator for return a functions execution in seconds.
-
-    Args:
-        function: function to be timed
 
-    Returns: time taken plus the original function executed.
 
-    """
+CATEGORIES = (
+    "Standards Track",
+    "Informational",
+    "Experimental",
+    "Historic",
+    "Best Current Practice",
+    "Proposed Standard",
+    "Internet Standard",
+)
 
-    @functools.wraps(function)
-    def wrapper(*args, **kwargs):
-        t1 = time.time()
-        result = function(*args, **kwargs)
-        click.echo(f"Download completed in {time.time() - t1:.2f} seconds")
-        return result
 
-    return wrapper
+CATEGORY_NAMES = {category.lower(): category for category in CATEGORIES}
+# matched against a lower cased header, re.IGNORECASE is several times slower
+CATEGORY_REGEX = re.compile("|".join(map(re.escape, CATEGORY_NAMES)))
 
 
 def get_categories(text):
     """Parse through each text file searching for the IETF's categories.
 
+    A single precompiled alternation scans the header once, so the category
+    appearing first in the document wins.
+
     :arg text: from rfc txt file
 
     :return any matched category, if not found or rfc not does not give a
-            category return "uncategorised".
+            category return "Uncategorised".
     """
 
-    header = text[:500]
-    categories = [
-        "Standards Track",
-        "Informational",
-        "Experimental",
-        "Historic",
-        "Best Current Practice",
-        "Proposed Standard",
-        "Internet Standard",
-    ]
-    match = [
-        x
-        for x in [re.findall(x.title(), header.title()) for x in categories]
-        if len(x) > 0
-    ]
-    try:
-        return match[0][0]
-    except IndexError:
+    match = CATEGORY_REGEX.search(text[:500].lower())
+    if match is None:
         return "Uncategorised"
+    return CATEGORY_NAMES[match.group()]
 
 
-def get_title_list():
-    """Parses all the current RFC titles from the rfc-index.txt file allowing
-    the title to be written to the database easily.
+def classify_categories(texts):
+    """Run fn:get_categories over many documents or headers.
 
-    :return list of RFC title information
-    """
-
-    list_of_titles = []
-    with open(os.path.join(Config.STORAGE_PATH, "rfc-index.txt"), "r") as f:
-        f = f.read().strip()
-        search_regex = "^([\d{1,4}])([^.]*)."
-        result = re.finditer(search_regex, f, re.M)
-        for title in result:
-            list_of_titles.append(title[0])
-    return list_of_titles
-
-
-def map_title_from_list(number, title_list):
-    """Used during the iterative inserts in fn:write_to_db - if number matches
-    the number within title_list, write title to db.
-
-    :arg number: string containing RFC number
-    :arg title_list: list of all rfc titles from fn:get_title_list
+    :arg texts: iterable of rfc txt bodies or headers
 
-    :returns result: string containing title of RFC.
+    :return list of categories, in the same order as texts.
     """
 
-    result = [title for title in title_list if number in title]
-    if result:
-        return result[0]
-    return None
-
-
-def strip_extensions():
-    """Strips away all non txt files from directory listing.
-
-    :return clean_list: generator of files with unwanted items removed
-    """
-    # This continually breaks as the IETF adds more file types
-    # let's look to make it find only postitives (txt) rather
-    # parse out negatives (non-txt).
-    _, _, files = next(os.walk(Config.STORAGE_PATH))
-    dirty_extensions = [
-        "a.txt",
-        "rfc-index.txt",
-        ".pdf",
-        ".ps",
-        ".ta",
-        ".html",
-        ".json",
-    ]
-    clean_list = (x for x in files if not any(xs in x for xs in dirty_extensions))
-    return clean_list
-
-
-def remove_rfc_files():
-    """Removes of downloaded and unzipped RFC files and folders after being
-    written to the database."""
-
-    shutil.rmtree(Config.STORAGE_PATH)
+    return [get_categories(text) for text in texts]
 
 
 def sanitize_inputs(inputs):
@@ -154,6 +78,8 @@ def create_config(testing=False):
 
     if not os.path.exists(Config.ROOT_FOLDER):
         os.mkdir(Config.ROOT_FOLDER)
+    import configparser
+
     config = configparser.ConfigParser()
     config.add_section("Settings")
     config.set("Settings", "Database Name", f"{Config.DATABASE_PATH}")
@@ -175,6 +101,8 @@ def read_config(testing=False):
 
     :return config: config file opened for reading."""
 
+    import configparser
+
     config = configparser.ConfigParser()
     config.read(Config.CONFIG_FILE)
 
@@ -230,11 +158,18 @@ def ask_user_to_update():
     print("[!] Do you wish to check for updates?")
     answer = input("rfc.py ~# [Y/n] ")
     if answer == "y" or answer == "Y" or answer == "":
+        # network and ingest modules are only imported on the update path
+        from rfcpy.helpers.ingest import (database_is_populated,
+                                          download_to_db, incremental_update)
+        from rfcpy.helpers.instrumentation import flush
+
         print("updating...")
-        download_rfc_tar()
-        uncompress_tar()
-        write_to_db()
+        if database_is_populated():
+            incremental_update()
+        else:
+            download_to_db()
         update_config()
+        flush()
 
 
 def first_run_update():
@@ -249,100 +184,12 @@ def first_run_update():
         if not os.path.exists(Config.DATABASE):
             print("[!] Database Not Found! [!]")
             print("The database will now be setup...")
-            download_rfc_tar()
-            uncompress_tar()
-            write_to_db()
+            from rfcpy.helpers.ingest import download_to_db
+            from rfcpy.helpers.instrumentation import flush
+
+            download_to_db()
             update_config()
+            flush()
 
     except OSError:
         raise
-
-
-@timer
-def download_rfc_tar():
-    """
-    Download all RFC's from IETF in a tar.gz for offline sorting.
-    Download progress is tracked via click.progressbar.
-    """
-
-    r = requests.get(Config.URL, stream=True)
-    dl_length = r.headers["Content-Length"]
-    if r.status_code == 200:
-        with open(
-            os.path.join(Config.ROOT_FOLDER, Config.FILENAME), "wb"
-        ) as f, click.progressbar(length=int(dl_length)) as bar:
-            r.raw.decode_content = True
-            for chunk in r.iter_content(1024):
-                f.write(chunk)
-                bar.update(len(chunk))
-
-        print("..\n[*] Download complete [*]")
-
-
-def uncompress_tar():
-    """Uncompress the downloaded tarball into the folder and then delete it."""
-
-    if os.path.exists(Config.STORAGE_PATH):
-        remove_rfc_files()
-    file_location = os.path.join(Config.ROOT_FOLDER, Config.FILENAME)
-    print("..uncompressing tar.gz...")
-    with tarfile.open(os.path.join(Config.ROOT_FOLDER, Config.FILENAME)) as f:
-        f.extractall(Config.STORAGE_PATH)
-    os.remove(file_location)
-    print("..Done!")
-
-
-def write_to_db():
-    """Write the contents of files to sqlite database.
-
-    function will run each time the database is updated. Relies on RFC number
-    as the Primary Key to issue Unique Key Constraint which prohibits duplicate
-    RFC's being written to DB.
-
-    Writes the following to models.Data (and its Virtual Table; DataIndex)
-        :arg number: RFC number taken from filename <rfc1918.txt>
-        :arg title: RFC Title taken from rfc-index.txt and mapped against number
-        :arg text: body of the document parsed for reading in terminal
-        :arg category: category type taken from document
-        :arg bookmark: boolean, if bookmarked returns 1 (True), default=0
-
-    Removes folder containing all text files post write.
-    """
-
-    create_tables()
-    print("..Beginning database writes..")
-    title_list = get_title_list()
-    for file in strip_extensions():
-        with open(os.path.join(Config.STORAGE_PATH, file), errors="ignore") as f:
-            f = f.read().strip()
-
-            try:
-                number = file.strip(".txt").strip("rfc")
-                title = map_title_from_list(number, title_list)
-                body = f
-                category = get_categories(f)
-                bookmark = False
-
-                with db.atomic():
-                    Data.create(
-                        number=number,
-                        title=title,
-                        text=body,
-                        category=category,
-                        bookmark=bookmark,
-                    )
-                    DataIndex.create(
-                        rowid=number, title=title, text=body, category=category
-                    )
-
-            except IntegrityError as e:
-                logging.debug(f"Integrity Error: {e} Raised at {number}")
-                pass
-            except AttributeError or ValueError as e:
-                logging.debug(f"{e}: hit at RFC {file}")
-                pass
-    else:
-        remove_rfc_files()
-        print("Successfully finished importing all files to database.")
-        print("Now removing unnecessary files from disk....")
-        print("...Done!")
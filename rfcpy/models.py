@@ -6,11 +6,114 @@ Full Text Search (Sqlite FTS5). SQL managed by the PeeWee ORM.
 All credit: <https://github.com/coleifer/peewee>
 """
 
+import contextlib
+import os
+import pathlib
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+
+from playhouse.pool import PooledSqliteExtDatabase
 from playhouse.sqlite_ext import *
 
 from rfcpy.helpers.config import Config
 
-db = SqliteExtDatabase(Config.DATABASE_PATH, pragmas={"journal_mode": "wal"})
+# recursive_triggers lets INSERT OR REPLACE fire the delete trigger which keeps
+# DataIndex in sync, see fn:create_triggers.
+PRAGMAS = {"journal_mode": "wal", "recursive_triggers": 1}
+
+
+def connection_pragmas(read_only=False):
+    """Pragmas issued on each new connection, see Config.SQLITE_MMAP_SIZE.
+
+    :arg read_only: for mode=ro connections, which refuse writes outright and
+                    rely on the WAL journal mode already persisted in the file.
+    """
+
+    tuning = {
+        "mmap_size": Config.SQLITE_MMAP_SIZE,
+        "cache_size": Config.SQLITE_CACHE_SIZE,
+        "busy_timeout": Config.BUSY_TIMEOUT,
+    }
+    if read_only:
+        return dict(tuning, query_only=1)
+    return dict(PRAGMAS, **tuning)
+
+
+class Database(PooledSqliteExtDatabase):
+    """Connections to the database file pooled between threads.
+
+    peewee gives each thread its own connection, checked out of the pool on
+    connect and handed back on close, so multithreaded consumers like
+    `rfc serve` reuse up to Config.POOL_SIZE open connections instead of
+    opening one per thread. Connections are recycled after
+    Config.POOL_STALE_TIMEOUT seconds. Writers are serialized by fn:writer.
+    """
+
+    def init(self, database, **kwargs):
+        # connections pooled for the previous file must not be handed out
+        if hasattr(self, "database"):
+            self.close_all()
+        super().init(database, **kwargs)
+
+
+db = Database(
+    Config.DATABASE_PATH,
+    pragmas=connection_pragmas(),
+    max_connections=Config.POOL_SIZE,
+    stale_timeout=Config.POOL_STALE_TIMEOUT,
+    timeout=Config.POOL_TIMEOUT,
+    check_same_thread=False,
+)
+# held by the one thread of this process allowed to write at a time.
+_write_lock = threading.RLock()
+
+
+LZMA_MAGIC = b"\xfd7zXZ\x00"
+
+
+def compress(text, algorithm):
+    """Compress text with "zlib" or "lzma"."""
+
+    if algorithm == "lzma":
+        import lzma
+
+        return lzma.compress(text.encode("utf-8"))
+    if algorithm == "zlib":
+        return zlib.compress(text.encode("utf-8"), 9)
+    raise ValueError(f"Unknown compression algorithm: {algorithm}")
+
+
+def decompress(value):
+    """Decompress a value written by fn:compress, the algorithm is detected
+    from the header so rows compressed with either can be read."""
+
+    value = bytes(value)
+    if value.startswith(LZMA_MAGIC):
+        import lzma
+
+        return lzma.decompress(value).decode("utf-8")
+    return zlib.decompress(value).decode("utf-8")
+
+
+class CompressedTextField(BlobField):
+    """Text compressed according to Config.COMPRESSION when written.
+
+    Plain TEXT values are returned untouched, so rows written before
+    compression was enabled stay readable until fn:migrate_compression
+    rewrites them.
+    """
+
+    def db_value(self, value):
+        if value is None or not Config.COMPRESSION:
+            return value
+        return super().db_value(compress(value, Config.COMPRESSION))
+
+    def python_value(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress(value)
 
 
 class BaseModel(Model):
@@ -25,26 +128,476 @@ class Data(BaseModel):
 
     number = IntegerField(primary_key=True)
     title = CharField()
-    text = CharField()
     category = CharField()
-    bookmark = BooleanField(default=False)
+    checksum = CharField(null=True)  # sha1 of text, compared on updates
+    published = DateField(null=True, index=True)
+    # last, so reading the columns above never walks the body's overflow pages
+    text = CompressedTextField()
+
+    class Meta:
+        # covering index for list views, see queries.SUMMARY
+        indexes = ((("number", "title", "category"), False),)
+
+
+class Bookmark(BaseModel):
+    """RFC's bookmarked by the user.
+
+    Kept apart from Data so listing bookmarks reads only this small table and
+    one primary key lookup per bookmark, however many RFC's are stored.
+    """
+
+    number = IntegerField(primary_key=True)
+    tags = CharField(default="")  # comma separated
+    note = TextField(default="")
+    created_at = DateTimeField(default=datetime.now, index=True)
 
 
 class DataIndex(FTS5Model):
-    """Virtual Table for Full Text Search of :class: Data."""
+    """Virtual Table for Full Text Search of :class: Data.
+
+    An external content table, only the full-text index is stored here and
+    title and category are read back from Data. Triggers created by
+    fn:create_triggers keep it in sync, so it is never written to directly.
+    """
 
     rowid = RowIDField()
     title = SearchField()
-    text = SearchField(unindexed=True)  # False returns too many hits in text
     category = SearchField()
 
     class Meta:
         database = db
-        options = {"tokenize": "porter"}  # FTS5 includes more tokenizer options
+        options = {
+            "tokenize": "porter",  # FTS5 includes more tokenizer options
+            "content": Data,
+            "content_rowid": Data.number,
+        }
+
+
+class DataBody(FTS5Model):
+    """Opt-in Virtual Table for Full Text Search of RFC bodies.
+
+    Unlike DataIndex this keeps its own copy of title and text, Data.text may
+    be compressed and snippet()/highlight() need the original to read from.
+    Written alongside Data during ingest whenever the table exists.
+    """
+
+    rowid = RowIDField()
+    title = SearchField()
+    text = SearchField()
+
+    class Meta:
+        database = db
+        options = {"tokenize": "porter"}
+
+
+def open_database():
+    """Reopen the database at Config.DATABASE_PATH for reading and writing."""
+
+    db.init(Config.DATABASE_PATH, pragmas=connection_pragmas())
+
+
+def open_read_only():
+    """Reopen the database as read-only URI connections.
+
+    Used by the scripted commands and `rfc serve` which never write. Every
+    connection in the pool is opened with mode=ro, so readers on any number
+    of threads never take a write lock.
+    """
+
+    uri = f"{pathlib.Path(Config.DATABASE_PATH).as_uri()}?mode=ro"
+    db.init(uri, uri=True, pragmas=connection_pragmas(read_only=True))
+
+
+@contextlib.contextmanager
+def writer(database=None):
+    """Transaction for a write, one thread of this process at a time.
+
+    The transaction starts with BEGIN IMMEDIATE so the write lock is taken up
+    front; other processes wait for it through busy_timeout instead of
+    failing when a read turns into a write. Reads on other threads carry on
+    meanwhile from their own connections. Nested calls join the outer
+    transaction as a savepoint.
+    """
+
+    database = database or Data._meta.database
+    with _write_lock, database.atomic("IMMEDIATE"):
+        yield
+
+
+def generation(database=None):
+    """Counter bumped by every update which changes Data, kept in PRAGMA
+    user_version so other processes see it too. Caches of query results
+    compare it to tell whether they are stale."""
+
+    database = database or Data._meta.database
+    return database.execute_sql("PRAGMA user_version").fetchone()[0]
+
+
+def bump_generation(database=None, at_least=0):
+    """Advance the generation, call within the transaction making the change.
+
+    :arg at_least: lowest value to advance to, e.g. to carry the generation
+                   of the database being replaced over to its rebuild.
+    """
+
+    database = database or Data._meta.database
+    value = max(generation(database) + 1, at_least)
+    database.execute_sql(f"PRAGMA user_version = {int(value)}")
+
+
+def _copy_into_live(path):
+    """Copy every page of db over the live database at path with the SQLite
+    online backup API.
+
+    The copy is an ordinary write transaction on the live database, through
+    its WAL, so connections other processes hold open to it stay valid and
+    see the new contents from their next transaction. Readers already in a
+    transaction carry on with the old contents until they finish it.
+    """
+
+    live = sqlite3.connect(path, timeout=Config.BUSY_TIMEOUT / 1000)
+    try:
+        db.connection().backup(live)
+        # best effort without waiting, readers still on the old pages leave
+        # the rest of the WAL to a later checkpoint
+        live.execute("PRAGMA busy_timeout = 0")
+        live.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        live.close()
+
+
+def _remove_database_files(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+@contextlib.contextmanager
+def _attach_live(path):
+    """Attach the live database at path to db as "live".
+
+    :return set of the live database's table names.
+    """
+
+    db.execute_sql("ATTACH DATABASE ? AS live", (path,))
+    try:
+        cursor = db.execute_sql(
+            "SELECT name FROM live.sqlite_master WHERE type = 'table'"
+        )
+        yield {name for name, in cursor.fetchall()}
+    finally:
+        db.execute_sql("DETACH DATABASE live")
+
+
+def _copy_live_state(path):
+    """Copy the bookmarks of the live database at path into db, and move the
+    generation past the live one so caches of it are invalidated."""
+
+    table = Bookmark._meta.table_name
+    columns = ", ".join(field.column_name for field in Bookmark._meta.sorted_fields)
+    with _attach_live(path) as tables:
+        live_generation = db.execute_sql("PRAGMA live.user_version").fetchone()[0]
+        with db.atomic():
+            if table in tables:
+                db.execute_sql(
+                    f'INSERT OR IGNORE INTO "{table}" ({columns}) '
+                    f'SELECT {columns} FROM live."{table}"'
+                )
+            bump_generation(db, at_least=live_generation + 1)
+
+
+def check_database():
+    """Run fn:maintain_database then verify the open database.
+
+    :raises DatabaseError: if PRAGMA integrity_check finds a problem.
+    """
+
+    maintain_database()
+    problems = [row for row, in db.execute_sql("PRAGMA integrity_check")]
+    if problems != ["ok"]:
+        raise DatabaseError(f"integrity check failed: {'; '.join(problems)}")
+
+
+def tune_search_indexes():
+    """Apply Config.FTS_AUTOMERGE and Config.FTS_CRISISMERGE to the full-text
+    indexes. Both are stored in the index so later writes use them too."""
+
+    for model in (DataIndex, DataBody):
+        if model.table_exists():
+            model.automerge(Config.FTS_AUTOMERGE)
+            model._fts_cmd("crisismerge", rank=Config.FTS_CRISISMERGE)
+
+
+def maintain_database(vacuum=False):
+    """Tidy the database after an update.
+
+    Each write to a full-text index adds a small segment which every search
+    has to merge, optimize folds them back into a single b-tree. ANALYZE and
+    PRAGMA optimize refresh the statistics the query planner relies on, and
+    the WAL is checkpointed and truncated so it does not keep the size of the
+    largest update on disk.
+
+    :arg vacuum: also rebuild the file to return free pages to the
+                 filesystem, slow and needs as much free space again.
+    """
+
+    database = Data._meta.database
+    # VACUUM and checkpoints cannot run in a transaction, so only the lock
+    # of fn:writer is taken.
+    with _write_lock:
+        tune_search_indexes()
+        for model in (DataIndex, DataBody):
+            if model.table_exists():
+                model.optimize()
+        database.execute_sql("ANALYZE")
+        database.execute_sql("PRAGMA optimize")
+        if vacuum:
+            database.execute_sql("VACUUM")
+        database.execute_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+@contextlib.contextmanager
+def shadow_database():
+    """Rebuild the database in a shadow file and swap it into place.
+
+    Inside the block db points at an empty <Config.DATABASE_PATH>.shadow with
+    the tables created. On leaving it the bookmarks and generation of the
+    live database are copied across, the shadow is optimized and checked
+    with fn:check_database and then copied into the live database in a
+    single transaction, see fn:_copy_into_live, so the live database is
+    never seen half written and connections to it stay valid. If anything
+    fails the shadow is deleted and the live database is left as it was.
+
+    Nested blocks are part of the outer rebuild and do nothing themselves.
+    """
+
+    path = Config.DATABASE_PATH
+    shadow = f"{path}.shadow"
+    if db.database == shadow:
+        yield
+        return
+    _remove_database_files(shadow)
+    db.init(shadow, pragmas=connection_pragmas())
+    try:
+        create_tables()
+        db.connect(reuse_if_open=True)
+        if os.path.exists(path):
+            with _attach_live(path) as tables:
+                if DataBody._meta.table_name in tables:
+                    DataBody.create_table()  # keep the body index built
+        yield
+        db.connect(reuse_if_open=True)
+        with _write_lock:
+            if os.path.exists(path):
+                _copy_live_state(path)
+                check_database()
+                _copy_into_live(path)
+            else:
+                check_database()
+                # nothing has the path open, closing every pooled connection
+                # folds the shadow's WAL into it before the rename
+                db.close_all()
+                os.replace(shadow, path)
+    except BaseException:
+        db.close_all()
+        _remove_database_files(shadow)
+        raise
+    finally:
+        open_database()
+    _remove_database_files(shadow)
+
+
+def create_triggers():
+    """Mirror inserts, deletes and title/category updates on Data into the
+    external content DataIndex table."""
+
+    database = Data._meta.database
+    data, index = Data._meta.table_name, DataIndex._meta.table_name
+    insert = (
+        f"INSERT INTO {index}(rowid, title, category) "
+        "VALUES (new.number, new.title, new.category);"
+    )
+    delete = (
+        f"INSERT INTO {index}({index}, rowid, title, category) "
+        "VALUES ('delete', old.number, old.title, old.category);"
+    )
+    for name, event, body in [
+        ("ai", "INSERT", insert),
+        ("ad", "DELETE", delete),
+        ("au", "UPDATE OF title, category", delete + insert),
+    ]:
+        database.execute_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {data}_{name} AFTER {event} ON {data} "
+            f"BEGIN {body} END"
+        )
+
+
+def migrate_search_index():
+    """Replace the standalone DataIndex of older releases, which kept a second
+    copy of every title, body and category, with the external content table.
+
+    :return True if the index was rebuilt.
+    """
+
+    database = Data._meta.database
+    sql = database.execute_sql(
+        "SELECT sql FROM sqlite_master WHERE name = ?", (DataIndex._meta.table_name,)
+    ).fetchone()
+    if sql is not None and "content=" in sql[0]:
+        return False
+    with database.atomic():
+        DataIndex.drop_table(safe=True)
+        DataIndex.create_table()
+        DataIndex.rebuild()
+    return True
+
+
+def migrate_bookmarks():
+    """Move bookmarks from the Data.bookmark column of older releases into
+    Bookmark, then drop the column.
+
+    :return number of bookmarks moved.
+    """
+
+    from playhouse.migrate import SqliteMigrator, migrate
+
+    database = Data._meta.database
+    table = Data._meta.table_name
+    columns = {column.name for column in database.get_columns(table)}
+    if "bookmark" not in columns:
+        return 0
+    with database.atomic():
+        Bookmark.create_table(safe=True)
+        cursor = database.execute_sql(f'SELECT number FROM "{table}" WHERE bookmark')
+        moved = add_bookmarks(number for number, in cursor.fetchall())
+        migrate(SqliteMigrator(database).drop_column(table, "bookmark"))
+    return moved
+
+
+def migrate_tables():
+    """Bring databases created by older releases up to the current schema."""
+
+    from playhouse.migrate import SqliteMigrator, migrate
+
+    database = Data._meta.database
+    table = Data._meta.table_name
+    with writer(database):
+        migrate_bookmarks()
+        columns = {column.name for column in database.get_columns(table)}
+        migrator = SqliteMigrator(database)
+        operations = [
+            migrator.add_column(table, field.column_name, field)
+            for field in Data._meta.sorted_fields
+            if field.column_name not in columns
+        ]
+        if operations:
+            migrate(*operations)
+        for model in (Data, Bookmark):
+            model._schema.create_indexes(safe=True)
+        migrate_search_index()
+        create_triggers()
 
 
 def create_tables():
     """Create the models tables."""
 
-    with db:
-        db.create_tables([Data, DataIndex], safe=True)
+    models = [Data, DataIndex, Bookmark]
+    if Config.BODY_INDEX:
+        models.append(DataBody)
+    with db.connection_context(), writer(db):
+        for model in models:
+            # indexes come from fn:migrate_tables once the columns missing from
+            # older tables are added, SQLite would index a missing column's
+            # name as a string literal.
+            model._schema.create_table(safe=True)
+        migrate_tables()
+
+
+def build_body_index(batch_size=None):
+    """Create and populate DataBody from the RFC's already in Data.
+
+    :arg batch_size: rows read and written per query, defaults to
+                     Config.BATCH_SIZE
+
+    :return number of RFC's indexed.
+    """
+
+    database = Data._meta.database
+    batch_size = batch_size or Config.BATCH_SIZE
+    indexed = 0
+    with writer(database):
+        DataBody.drop_table(safe=True)
+        DataBody.create_table()
+        query = Data.select(Data.number, Data.title, Data.text).tuples()
+        for batch in chunked(query.iterator(), batch_size):
+            DataBody.insert_many(
+                batch, fields=[DataBody.rowid, DataBody.title, DataBody.text]
+            ).execute()
+            indexed += len(batch)
+        DataBody.optimize()
+    return indexed
+
+
+def migrate_compression(batch_size=None):
+    """Rewrite stored RFC bodies to match Config.COMPRESSION.
+
+    Plain text rows are compressed when compression is enabled and compressed
+    rows are expanded when it is disabled. Run VACUUM afterwards to return the
+    freed pages to the filesystem.
+
+    :arg batch_size: rows rewritten per query, defaults to Config.BATCH_SIZE
+
+    :return number of rows rewritten.
+    """
+
+    database = Data._meta.database
+    stale = "text" if Config.COMPRESSION else "blob"
+    with writer(database):
+        numbers = [
+            number
+            for number, in Data.select(Data.number)
+            .where(fn.typeof(Data.text) == stale)
+            .tuples()
+        ]
+        for batch in chunked(numbers, batch_size or Config.BATCH_SIZE):
+            query = Data.select(Data.number, Data.text).where(Data.number.in_(batch))
+            for row in query:
+                Data.update(text=row.text).where(Data.number == row.number).execute()
+    return len(numbers)
+
+
+def add_bookmarks(numbers, tags=(), note=""):
+    """Bookmark many RFC's at once, numbers already bookmarked are skipped.
+
+    :arg numbers: iterable of RFC numbers
+    :arg tags: iterable of tags given to each new bookmark
+    :arg note: note given to each new bookmark
+
+    :return number of bookmarks added.
+    """
+
+    tags = ",".join(tags)
+    created_at = datetime.now()
+    rows = ((number, tags, note, created_at) for number in numbers)
+    fields = [Bookmark.number, Bookmark.tags, Bookmark.note, Bookmark.created_at]
+    added = 0
+    with writer(Bookmark._meta.database):
+        for batch in chunked(rows, Config.BATCH_SIZE):
+            query = Bookmark.insert_many(batch, fields=fields).on_conflict_ignore()
+            added += query.as_rowcount().execute()
+    return added
+
+
+def remove_bookmarks(numbers):
+    """Remove the bookmarks of many RFC's at once.
+
+    :arg numbers: iterable of RFC numbers
+
+    :return number of bookmarks removed.
+    """
+
+    removed = 0
+    with writer(Bookmark._meta.database):
+        for batch in chunked(numbers, Config.BATCH_SIZE):
+            removed += Bookmark.delete().where(Bookmark.number.in_(batch)).execute()
+    return removed
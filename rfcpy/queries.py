@@ -0,0 +1,193 @@
+"""Read-only queries shared by the interactive pages and the command line.
+
+Each function returns a peewee query or model instance, leaving printing and
+paging to the caller.
+
+Opened RFC's and the results of fn:search_results are kept in CACHE, an LRU
+cache of Config.CACHE_BYTES which is emptied whenever an update bumps the
+database generation.
+"""
+
+import random
+
+from peewee import fn
+
+from rfcpy.helpers.cache import LRUCache
+from rfcpy.helpers.config import Config
+from rfcpy.helpers.instrumentation import inc
+from rfcpy.models import Bookmark, Data, DataBody, DataIndex, generation
+
+# columns shown by list views. Scans are answered from the covering index on
+# these columns, so bodies are only read once a document is opened.
+SUMMARY = (Data.number, Data.title, Data.category)
+# bytes counted for each cached result on top of the lengths of its strings.
+RESULT_OVERHEAD = 200
+
+CACHE = LRUCache(Config.CACHE_BYTES)
+
+
+def _cached(key, load, size):
+    """CACHE[key], calling load() and storing the result with its size(result)
+    on a miss."""
+
+    if not CACHE.max_bytes:
+        return load()
+    # read before load(), so a value is never stored under a generation
+    # newer than the data it was loaded from
+    current = (Data._meta.database.database, generation())
+    CACHE.validate(current)
+    value = CACHE.get(key, generation=current)
+    if value is not None:
+        inc("cache_hits", kind=key[0])
+        return value
+    inc("cache_misses", kind=key[0])
+    value = load()
+    CACHE.put(key, value, size(value), generation=current)
+    return value
+
+
+def _result_size(result):
+    return RESULT_OVERHEAD + len(result.title or "") + len(result.category or "")
+
+
+def cache_stats():
+    """Hit and miss counts of CACHE, see fn:LRUCache.stats."""
+
+    return CACHE.stats()
+
+
+def get_rfc(number):
+    """Fetch a single RFC by number, from CACHE if it was read recently.
+
+    :arg number: RFC number
+
+    :raises DoesNotExist: if the RFC is not in the database.
+    """
+
+    number = int(number)
+    return _cached(
+        ("rfc", number),
+        lambda: Data.get_by_id(number),
+        lambda rfc: _result_size(rfc) + len(rfc.text or ""),
+    )
+
+
+def search(phrase, limit=None, offset=None):
+    """Full text search over title and category, best matches first.
+
+    Results carry number, title and category only, see fn:get_rfc for the text.
+
+    :arg phrase: sanitized search phrase, see fn:utils.sanitize_inputs
+    :arg limit: maximum number of results, None returns every match
+    :arg offset: number of results to skip, for paging
+    """
+
+    return (
+        Data.select(*SUMMARY)
+        .join(DataIndex, on=(Data.number == DataIndex.rowid))
+        .where(DataIndex.match(phrase))
+        .order_by(DataIndex.bm25())
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+def search_results(phrase, limit=None, offset=None):
+    """fn:search as a list, from CACHE if the same search was run recently."""
+
+    return _cached(
+        ("search", phrase, limit, offset),
+        lambda: list(search(phrase, limit, offset)),
+        lambda results: sum(_result_size(result) for result in results),
+    )
+
+
+def search_body(phrase, limit=20, offset=0, markers=("[", "]")):
+    """Full text search over title and body using the opt-in DataBody index.
+
+    Title matches are weighted ten times higher than body matches.
+
+    :arg phrase: sanitized search phrase, see fn:utils.sanitize_inputs
+    :arg limit: results per page
+    :arg offset: number of results to skip
+    :arg markers: strings placed either side of matched terms
+
+    :return tuple of (total matches, page). Each row of the page has number,
+            title (matches highlighted) and snippet (matched part of the body).
+    """
+
+    table = DataBody._meta.entity
+    left, right = markers
+    match = DataBody.match(phrase)
+    total = DataBody.select().where(match).count()
+    page = (
+        DataBody.select(
+            DataBody.rowid.alias("number"),
+            fn.highlight(table, 0, left, right).alias("title"),
+            fn.snippet(table, 1, left, right, "...", 16).alias("snippet"),
+        )
+        .where(match)
+        .order_by(DataBody.bm25(10.0, 1.0))
+        .limit(limit)
+        .offset(offset)
+        .namedtuples()
+    )
+    return total, page
+
+
+def random_rfc(attempts=10):
+    """Pick a RFC at random without sorting the whole table.
+
+    Numbers are sampled from the range held locally and looked up by primary
+    key, retrying when the number falls in a gap. If every attempt misses the
+    next RFC above a random number is used instead.
+
+    :arg attempts: number of primary key lookups to try before falling back
+
+    :return Data instance or None if the database is empty.
+    """
+
+    low, high = Data.select(fn.MIN(Data.number), fn.MAX(Data.number)).scalar(
+        as_tuple=True
+    )
+    if high is None:
+        return None
+    for _ in range(attempts):
+        rfc = Data.get_or_none(Data.number == random.randint(low, high))
+        if rfc is not None:
+            return rfc
+    return (
+        Data.select()
+        .where(Data.number >= random.randint(low, high))
+        .order_by(Data.number)
+        .first()
+    )
+
+
+def bookmarks(tag=None):
+    """Bookmarked RFC's, oldest bookmark first.
+
+    Each result has number, title, category, tags, note and created_at.
+
+    :arg tag: only return bookmarks with this tag
+    """
+
+    query = (
+        Bookmark.select(Bookmark, Data.title, Data.category)
+        .join(Data, on=(Bookmark.number == Data.number))
+        .order_by(Bookmark.created_at, Bookmark.number)
+    )
+    if tag is not None:
+        query = query.where(fn.instr("," + Bookmark.tags + ",", f",{tag},") > 0)
+    return query.objects()
+
+
+def latest(limit=10):
+    """The most recently published RFC's, newest first.
+
+    Walks the covering index backwards so only limit entries are read.
+
+    :arg limit: number of RFC's to return
+    """
+
+    return Data.select(*SUMMARY).order_by(Data.number.desc()).limit(limit)
@@ -8,26 +8,31 @@
 
         Copyright (C) 2018-2020, Daniel Michaels
 """
+import logging
 import sys
 from time import sleep
 
 import click
-from peewee import DoesNotExist, OperationalError, fn
+from peewee import DoesNotExist, OperationalError
 
+from rfcpy import queries
 from rfcpy.helpers.display import (Color, clear_screen, logo,
                                    print_by_bookmark, print_by_keyword,
-                                   print_by_number, print_get_latest, prompt)
+                                   print_by_number, print_get_latest, prompt,
+                                   title_without_number)
 from rfcpy.helpers.utils import (ask_user_to_update, check_last_update,
                                  read_config, sanitize_inputs)
-from rfcpy.models import Data, DataIndex
+from rfcpy.models import add_bookmarks, create_tables, remove_bookmarks
 
 
 def main():
+    logging.basicConfig(level=logging.INFO)
     try:
         clear_screen()
         logo()
         read_config()
         check_last_update()
+        create_tables()  # brings databases from older releases up to date
         home_page()
 
     except OSError:
@@ -105,7 +110,7 @@ def search_by_number():
             print("[!!] Please enter rfc using numbers only i.e. 8305 [!!]")
             print("Exiting..")
             sys.exit(1)
-        result = Data.get_by_id(number).text
+        result = queries.get_rfc(number).text
         pager(result)
         bookmarker(number)
 
@@ -129,17 +134,11 @@ def search_by_keyword():
     print("[*] Enter Keyword/s [http/2 hpack]")
     phrase = input(f"{prompt}")
     phrase = sanitize_inputs(phrase)
-    query = (
-        Data.select()
-        .join(DataIndex, on=(Data.number == DataIndex.rowid))
-        .where(DataIndex.match(phrase))
-        .order_by(DataIndex.bm25())
-    )
     try:
-        for results in query:
+        for results in queries.search_results(phrase):
             print(
-                f"{Color.OKBLUE}Matches:{Color.NOTICE} RFC {results.title[:5]}"
-                f"{Color.HEADER}- {results.title[5:]}{Color.END}"
+                f"{Color.OKBLUE}Matches:{Color.NOTICE} RFC {results.number} "
+                f"{Color.HEADER}- {title_without_number(results.title)}{Color.END}"
             )
         print()
         search_by_number()
@@ -153,11 +152,10 @@ def search_bookmarks():
     print_by_bookmark()
     print("[*] All Bookmarked RFC's[*]")
     print()
-    query = Data.select().where(Data.bookmark == 1)
-    for result in query:
+    for result in queries.bookmarks():
         print(
             f"\t{Color.OKBLUE}RFC {result.number} - {Color.NOTICE}"
-            f"{result.title[5:]}{Color.END}"
+            f"{title_without_number(result.title)}{Color.END}"
         )
     search_by_number()
 
@@ -182,23 +180,22 @@ def settings_page():
 
 
 def update_bookmarks():
-    """Updates the Bookmark row in database for selected RFC."""
+    """Removes the bookmarks of the selected RFC's."""
     print("[!] Select bookmark to delete [!]")
     print()
-    query = Data.select().where(Data.bookmark == 1)
-    for result in query:
+    for result in queries.bookmarks():
         print(
             f"\t{Color.OKBLUE}RFC {result.number} - {Color.NOTICE}"
-            f"{result.title[5:]}{Color.END}"
+            f"{title_without_number(result.title)}{Color.END}"
         )
     print()
-    print("[*] Enter Bookmark to delete by number [eg. 8305]  [*]")
-    print("[*] OR Press [Enter] for Home Page                 [*]")
+    print("[*] Enter Bookmarks to delete by number [eg. 8305 7540]  [*]")
+    print("[*] OR Press [Enter] for Home Page                       [*]")
     choice = input(prompt)
+    numbers = choice.split()
 
-    if choice.isdigit():
-        update = Data(number=choice, bookmark=0)
-        update.save()
+    if numbers and all(number.isdigit() for number in numbers):
+        remove_bookmarks([int(number) for number in numbers])
         update_bookmarks()
         print()
     elif choice == "" or choice == "q":
@@ -214,34 +211,34 @@ def bookmarker(number):
 
     bookmark = input("Do you wish to bookmark this? [y/N] >> ")
     if bookmark == "y" or bookmark == "Y":
-        print("YES", number)
-        update = Data(number=number, bookmark=1)
-        update.save()
+        add_bookmarks([int(number)])
     home_page()
 
 
 def latest():
     """Get the most recent RFC's returning ten by default but the user can
-    specify a set number to see.
-
-    :arg number (default=10) user can set how many to retrieve."""
+    specify a set number to see."""
     print_get_latest()
-    query = Data.select().order_by(Data.title.desc()).limit(10)
-    # this is a slow lookup - needs optimisation.
-    for result in query:
+    print("[*] How many? [Enter] for 10")
+    choice = input(f"{prompt}")
+    limit = int(choice) if choice.isdigit() and int(choice) > 0 else 10
+    for result in queries.latest(limit):
         print(
             f"\t{Color.OKBLUE}RFC {result.number} - {Color.NOTICE}"
-            f"{result.title[5:]}{Color.END}"
+            f"{title_without_number(result.title)}{Color.END}"
         )
     search_by_number()
 
 
 def random_rfc():
     """Randomly selects a RFC."""
-    random = Data.select().order_by(fn.Random()).limit(1)
-    for record in random:
+    record = queries.random_rfc()
+    if record is None:
+        print("[!] No RFC's in the database [!]")
+        home_page()
+    else:
         pager(record.text)
-    bookmarker(random)
+        bookmarker(record.number)
 
 
 def pager(data):
@@ -0,0 +1,193 @@
+"""Read-only HTTP/JSON interface to the RFC database, started by `rfc serve`.
+
+    GET /rfc/<number>                      one RFC including its text
+    GET /search?q=<phrase>&limit=&offset=  title and category search
+    GET /latest?n=10                       most recent RFC's
+    GET /bookmarks?tag=                    bookmarked RFC's
+
+Every response is JSON with a strong ETag, so clients can revalidate with
+If-None-Match and get a 304 back, and is gzipped for clients that accept it.
+Each client connection is answered on its own thread, each request borrows a
+read-only database connection from the pool, see fn:RFCServer.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from peewee import DoesNotExist, OperationalError
+
+from rfcpy import queries
+from rfcpy.helpers.display import title_without_number
+from rfcpy.helpers.instrumentation import inc, span
+from rfcpy.helpers.utils import sanitize_inputs
+from rfcpy.models import db
+
+logger = logging.getLogger("rfcpy.server")
+
+# responses smaller than this are not worth gzipping.
+GZIP_MIN_BYTES = 1024
+# largest page of results a client may ask for.
+MAX_LIMIT = 1000
+
+
+class HTTPError(Exception):
+    """Ends a request with status and a JSON error message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def summary(result):
+    return {
+        "number": result.number,
+        "title": title_without_number(result.title),
+        "category": result.category,
+    }
+
+
+def int_param(params, name, default, maximum=MAX_LIMIT):
+    try:
+        value = int(params.get(name, [default])[0])
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a number")
+    if not 0 <= value <= maximum:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be 0-{maximum}")
+    return value
+
+
+def get_rfc(number, params):
+    try:
+        rfc = queries.get_rfc(number)
+    except (DoesNotExist, ValueError, OverflowError):
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"RFC {number} not found")
+    published = rfc.published.isoformat() if rfc.published else None
+    return dict(summary(rfc), published=published, text=rfc.text)
+
+
+def search(params):
+    phrase = sanitize_inputs(params.get("q", [""])[0])
+    if not phrase.strip():
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "q is required")
+    limit = int_param(params, "limit", 20)
+    offset = int_param(params, "offset", 0, maximum=2**31)
+    try:
+        results = queries.search_results(phrase, limit, offset)
+    except OperationalError as e:
+        # e.g. a bare AND, which FTS5 reads as an incomplete query
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"cannot search for {phrase!r}: {e}")
+    return [summary(result) for result in results]
+
+
+def latest(params):
+    return [summary(result) for result in queries.latest(int_param(params, "n", 10))]
+
+
+def bookmarks(params):
+    tag = params.get("tag", [None])[0]
+    return [summary(result) for result in queries.bookmarks(tag)]
+
+
+# {first path segment: (endpoint, takes an argument)}
+ROUTES = {
+    "rfc": (get_rfc, True),
+    "search": (search, False),
+    "latest": (latest, False),
+    "bookmarks": (bookmarks, False),
+}
+
+
+def route(path):
+    """Endpoint function and arguments for a request path.
+
+    :raises HTTPError: 404 if no endpoint matches.
+    """
+
+    parts = urlsplit(path)
+    segments = [segment for segment in parts.path.split("/") if segment]
+    endpoint, takes_argument = ROUTES.get(segments[0] if segments else "", (None, 0))
+    if endpoint is None or len(segments) != 1 + takes_argument:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"no such endpoint {parts.path}")
+    params = parse_qs(parts.query)
+    return endpoint, segments[1:] + [params]
+
+
+def etag(body, encoding=None):
+    digest = hashlib.sha1(body).hexdigest()[:20]
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+class RFCHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "rfcpy"
+    # seconds an idle keep-alive connection may hold a thread.
+    timeout = 5
+    # headers and body are written separately, don't let Nagle delay the body.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        self.respond(head=False)
+
+    def do_HEAD(self):
+        self.respond(head=True)
+
+    def respond(self, head):
+        try:
+            endpoint, args = route(self.path)
+            with span("request", endpoint=endpoint.__name__), db.connection_context():
+                status, payload = HTTPStatus.OK, endpoint(*args)
+        except HTTPError as e:
+            status, payload = e.status, {"error": e.message}
+        except Exception:
+            logger.exception(f"Error answering {self.path}")
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            payload = {"error": "internal error"}
+        inc("requests", status=int(status))
+        body = json.dumps(payload).encode()
+        accepts_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        encoding = "gzip" if accepts_gzip and len(body) >= GZIP_MIN_BYTES else None
+        tag = etag(body, encoding)
+        if status == HTTPStatus.OK and tag in self.headers.get("If-None-Match", ""):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", tag)
+            self.end_headers()
+            return
+        if encoding:
+            body = gzip.compress(body, compresslevel=6)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Vary", "Accept-Encoding")
+        if status == HTTPStatus.OK:
+            self.send_header("ETag", tag)
+            self.send_header("Cache-Control", "no-cache")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+class RFCServer(ThreadingHTTPServer):
+    """HTTP server answering each client connection on its own thread.
+
+    A request checks a read-only connection out of the pool held by
+    models.db and returns it when answered, so idle keep-alive clients hold
+    no connection and open connections keep their page cache and mmap
+    between clients. Under WAL readers do not block each other or an update
+    running in another process.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, RFCHandler)
@@ -28,7 +28,7 @@ REQUIRES_PYTHON = ">= Python 3.6"
 # Include what dependencies it requires:
 REQUIRED = ["requests", "click", "peewee", "responses"]
 
-entry_points = {"console_scripts": [["rfc = rfcpy.rfc:main"]]}
+entry_points = {"console_scripts": [["rfc = rfcpy.cli:cli"]]}
 
 
 setup(
@@ -0,0 +1,65 @@
+"""Shared fixtures for tests run against a database file on disk."""
+
+import os
+import shutil
+import sqlite3
+import unittest
+from unittest import mock
+
+from rfcpy import queries
+from rfcpy.helpers.config import Config
+from rfcpy.models import (Bookmark, Data, DataBody, DataIndex, create_tables,
+                          db, open_database)
+
+
+def create_baseline_database(path, bookmarked=(7540,)):
+    """Create a database at path with the schema of the first release: a
+    bookmark column in data and a standalone FTS5 dataindex."""
+
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("PRAGMA journal_mode = wal")
+        connection.execute(
+            'CREATE TABLE "data" ("number" INTEGER NOT NULL PRIMARY KEY, '
+            '"title" VARCHAR(255) NOT NULL, "text" VARCHAR(255) NOT NULL, '
+            '"category" VARCHAR(255) NOT NULL, "bookmark" INTEGER NOT NULL)'
+        )
+        connection.execute(
+            'CREATE VIRTUAL TABLE "dataindex" USING fts5 '
+            '("title", "text" UNINDEXED, "category", tokenize=porter)'
+        )
+        for number, title in [(7540, "7540 HTTP/2"), (8446, "8446 TLS 1.3")]:
+            row = (number, title, f"text of {number}", "Standards Track")
+            connection.execute(
+                "INSERT INTO data VALUES (?, ?, ?, ?, ?)",
+                row + (number in bookmarked,),
+            )
+            connection.execute("INSERT INTO dataindex VALUES (?, ?, ?)", row[1:])
+    connection.close()
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Points models.db at a database file in Config.TESTS_FOLDER for each
+    test, the folder is removed afterwards. Subclasses add their own rows
+    after calling setUp."""
+
+    def setUp(self):
+        os.makedirs(Config.TESTS_FOLDER, exist_ok=True)
+        self.path = os.path.join(Config.TESTS_FOLDER, "database.db")
+        self.patcher = mock.patch.object(Config, "DATABASE_PATH", self.path)
+        self.patcher.start()
+        open_database()
+        db.bind([Data, DataIndex, DataBody, Bookmark])
+        self.create_database()
+        queries.CACHE.clear()
+
+    def create_database(self):
+        """Create the empty tables, override to start from another schema."""
+
+        create_tables()
+
+    def tearDown(self):
+        db.close_all()
+        shutil.rmtree(Config.TESTS_FOLDER)
+        self.patcher.stop()
+        open_database()
@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+
+from benchmarks.bench_update import compare, run
+from benchmarks.corpus import generate
+from rfcpy.helpers.ingest import get_title_index
+from rfcpy.helpers.utils import classify_categories
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Keep the benchmark harness working, timings are not checked."""
+
+    def test_corpus_matches_index(self):
+        documents, index_text = generate(30, paragraphs=2)
+        index = get_title_index(index_text)
+        self.assertEqual(len(documents), 30)
+        self.assertTrue(all(number in index for number, _ in documents))
+        categories = classify_categories(text for _, text in documents)
+        self.assertNotIn("Uncategorised", categories)
+
+    def test_run_and_compare(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = run(20, directory, repeat=3, workers=1)
+        self.assertEqual(
+            list(result["stages"]),
+            [
+                "uncompress_tar",
+                "get_title_index",
+                "get_categories",
+                "write_to_db",
+                "pipeline_to_db",
+                "build_body_index",
+            ],
+        )
+        self.assertEqual(result["queries"]["search"]["runs"], 3)
+        results = {"runs": [result]}
+        self.assertEqual(compare(results, results, tolerance=0.5), [])
+        slower = {"runs": [dict(result, stages={"write_to_db": 1e9})]}
+        self.assertEqual(len(compare(slower, results, tolerance=0.5)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
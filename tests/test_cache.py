@@ -0,0 +1,75 @@
+import threading
+import unittest
+
+from rfcpy.helpers.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test the byte bounded LRU cache."""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_bytes=10)
+        cache.put("a", "A", 4)
+        cache.put("b", "B", 4)
+        self.assertEqual(cache.get("a"), "A")
+        cache.put("c", "C", 4)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), ("A", "C"))
+        self.assertEqual(cache.bytes, 8)
+        cache.put("a", "AA", 6)
+        self.assertEqual(cache.bytes, 10)
+        cache.put("huge", "H", 11)
+        self.assertIsNone(cache.get("huge"))
+        self.assertEqual(
+            cache.stats(),
+            {
+                "hits": 3,
+                "misses": 2,
+                "hit_rate": 3 / 5,
+                "evictions": 1,
+                "entries": 2,
+                "bytes": 10,
+                "max_bytes": 10,
+            },
+        )
+
+    def test_validate(self):
+        cache = LRUCache(max_bytes=10)
+        cache.validate(1)
+        cache.put("a", "A", 1)
+        cache.validate(1)
+        self.assertEqual(cache.get("a"), "A")
+        cache.validate(2)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.bytes, 0)
+
+    def test_stale_put(self):
+        cache = LRUCache(max_bytes=10)
+        cache.validate(1)
+        # read at generation 1, stored after another thread moved on to 2
+        cache.validate(2)
+        cache.put("a", "old", 1, generation=1)
+        self.assertIsNone(cache.get("a", generation=2))
+        self.assertEqual(cache.bytes, 0)
+        cache.put("a", "new", 1, generation=2)
+        self.assertEqual(cache.get("a", generation=2), "new")
+
+    def test_threads(self):
+        cache = LRUCache(max_bytes=100)
+
+        def work(offset):
+            for i in range(1000):
+                cache.put(offset + i % 50, i, 1)
+                cache.get(offset + i % 50)
+
+        threads = [threading.Thread(target=work, args=(n * 50,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.bytes, 100)
+        self.assertEqual(cache.stats()["entries"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+from click.testing import CliRunner
+
+from rfcpy.cli import cli
+from rfcpy.helpers.config import Config
+from rfcpy.models import Bookmark, Data, db
+from tests.helpers import DatabaseTestCase, create_baseline_database
+
+
+class TestCli(DatabaseTestCase):
+    """Test the scripted commands against a database on disk."""
+
+    def setUp(self):
+        super().setUp()
+        with db:
+            for number, title, bookmark in [
+                (7540, "7540 Hypertext Transfer Protocol Version 2 (HTTP/2)", True),
+                (8446, "8446 The Transport Layer Security (TLS) Protocol", False),
+            ]:
+                text = f"text of {number}"
+                Data.create(
+                    number=number,
+                    title=title,
+                    text=text,
+                    category="Standards Track",
+                )
+                if bookmark:
+                    Bookmark.create(number=number)
+        self.runner = CliRunner()
+
+    def test_get(self):
+        result = self.runner.invoke(cli, ["get", "8446"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, "text of 8446\n")
+
+    def test_get_missing(self):
+        result = self.runner.invoke(cli, ["get", "1"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("RFC 1 not found", result.output)
+        result = self.runner.invoke(cli, ["get", "99999999999999999999"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("not found", result.output)
+
+    def test_invalid_input(self):
+        for operator in ("AND", "OR", "NOT"):
+            result = self.runner.invoke(cli, ["search", operator])
+            self.assertEqual(result.exit_code, 1, result.output)
+            self.assertIn(f"Cannot search for '{operator}'", result.output)
+        for args in (["latest", "-n", "-1"], ["search", "tls", "--limit", "-5"]):
+            result = self.runner.invoke(cli, args)
+            self.assertEqual(result.exit_code, 2, args)
+
+    def test_search_json(self):
+        result = self.runner.invoke(cli, ["search", "tls", "--json"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            json.loads(result.output),
+            [
+                {
+                    "number": 8446,
+                    "title": "The Transport Layer Security (TLS) Protocol",
+                    "category": "Standards Track",
+                }
+            ],
+        )
+
+    def test_search_limit(self):
+        result = self.runner.invoke(cli, ["search", "Standards", "--limit", "1"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(len(result.output.splitlines()), 1)
+
+    def test_search_body(self):
+        result = self.runner.invoke(cli, ["search", "text", "--body"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("rfc index-body", result.output)
+        result = self.runner.invoke(cli, ["index-body"])
+        self.assertEqual(result.output, "2 RFC's indexed.\n")
+        args = ["search", "text", "--body", "--limit", "1", "--offset", "1"]
+        result = self.runner.invoke(cli, args + ["--json"])
+        output = json.loads(result.output)
+        self.assertEqual(output["total"], 2)
+        self.assertEqual(len(output["results"]), 1)
+        self.assertIn("[text] of", output["results"][0]["snippet"])
+        result = self.runner.invoke(cli, args)
+        self.assertTrue(result.output.startswith("Showing 2-2 of 2 matches"))
+
+    def test_bookmarks(self):
+        result = self.runner.invoke(cli, ["bookmarks"])
+        self.assertEqual(
+            result.output, "RFC 7540 - Hypertext Transfer Protocol Version 2 (HTTP/2)\n"
+        )
+
+    def test_bookmark(self):
+        result = self.runner.invoke(cli, ["bookmark", "8446", "--tag", "tls"])
+        self.assertEqual(result.output, "1 bookmarks added.\n")
+        result = self.runner.invoke(cli, ["bookmarks", "--tag", "tls", "--json"])
+        self.assertEqual([row["number"] for row in json.loads(result.output)], [8446])
+        result = self.runner.invoke(cli, ["bookmark", "--remove", "7540", "8446"])
+        self.assertEqual(result.output, "2 bookmarks removed.\n")
+
+    def test_migrates_old_database(self):
+        db.close_all()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(Config.DATABASE_PATH + suffix):
+                os.remove(Config.DATABASE_PATH + suffix)
+        create_baseline_database(Config.DATABASE_PATH)
+        result = self.runner.invoke(cli, ["bookmarks", "--json"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual([row["number"] for row in json.loads(result.output)], [7540])
+        result = self.runner.invoke(cli, ["search", "tls"])
+        self.assertEqual(result.output, "RFC 8446 - TLS 1.3\n")
+
+    def test_maintain(self):
+        result = self.runner.invoke(cli, ["maintain", "--vacuum"])
+        self.assertEqual(result.exit_code, 0)
+        size, latency = result.output.splitlines()
+        self.assertTrue(size.startswith("Size: "))
+        self.assertTrue(latency.startswith("Search latency: "))
+        self.assertFalse(os.path.getsize(f"{Config.DATABASE_PATH}-wal"))
+
+    @mock.patch("rfcpy.server.RFCServer.serve_forever", side_effect=KeyboardInterrupt)
+    def test_serve(self, serve_forever):
+        with mock.patch.object(Config, "SERVE_PORT", 0):
+            result = self.runner.invoke(cli, ["serve"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertRegex(result.output, r"^Serving RFC's on http://127.0.0.1:\d+/")
+        result = self.runner.invoke(cli, ["serve", "--port", "0"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        result = self.runner.invoke(cli, ["serve", "--port", "http"])
+        self.assertEqual(result.exit_code, 2)
+
+    def test_compress(self):
+        def stored_as():
+            sql = "SELECT DISTINCT typeof(text) FROM data"
+            with db:
+                return db.execute_sql(sql).fetchall()
+
+        for algorithm, stored in (("zlib", "blob"), ("none", "text")):
+            with mock.patch.object(Config, "COMPRESSION", Config.COMPRESSION):
+                result = self.runner.invoke(cli, ["compress", "--algorithm", algorithm])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("2 RFC's rewritten", result.output)
+            self.assertEqual(stored_as(), [(stored,)])
+        result = self.runner.invoke(cli, ["get", "8446"])
+        self.assertEqual(result.output, "text of 8446\n")
+
+    def test_latest(self):
+        result = self.runner.invoke(cli, ["latest", "-n", "1"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("RFC 8446", result.output)
+
+    @mock.patch("rfcpy.cli.open_database")
+    def test_read_only_connection_only(self, open_database):
+        result = self.runner.invoke(cli, ["latest"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        open_database.assert_not_called()
+
+    def test_read_only(self):
+        self.runner.invoke(cli, ["latest"])
+        with self.assertRaises(Exception):
+            Data.create(number=1, title="x", text="x", category="x")
+
+    def test_missing_database(self):
+        with mock.patch.object(Config, "DATABASE_PATH", "/nonexistent/db"):
+            result = self.runner.invoke(cli, ["latest"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Database not found", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,43 @@
+import io
+import os
+import sqlite3
+import tarfile
+import threading
 import unittest
+from datetime import date
+from unittest import mock
 
+from peewee import DatabaseError
 from playhouse.sqlite_ext import SqliteExtDatabase
 
-from rfcpy.models import Data, DataIndex
+from rfcpy import queries
+from rfcpy.helpers.config import Config
+from rfcpy.helpers.ingest import (apply_index, build_rows, bulk_insert,
+                                  checksum, find_stale_rfcs, get_title_index,
+                                  make_row, pipeline_to_db, upsert_rows)
+from rfcpy.models import (Bookmark, Data, DataBody, DataIndex, add_bookmarks,
+                          build_body_index, bump_generation, create_tables,
+                          create_triggers, db, generation, maintain_database,
+                          migrate_bookmarks, migrate_compression,
+                          migrate_search_index, open_read_only,
+                          remove_bookmarks, shadow_database, writer)
+from tests.helpers import DatabaseTestCase, create_baseline_database
 
-test_db = SqliteExtDatabase(":memory:")
+test_db = SqliteExtDatabase(":memory:", pragmas={"recursive_triggers": 1})
+
+
+def tar_chunks(members, chunk_size=1000):
+    """A tar.gz of {filename: text} members split into chunks of bytes."""
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, text in members.items():
+            data = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    data = buffer.getvalue()
+    return [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
 
 
 class TestDB(unittest.TestCase):
@@ -13,9 +46,14 @@ class TestDB(unittest.TestCase):
     def setUp(self):
         """Setup the database and create one entry, including the sqlite3
         full-text search. Database is peewee ORM."""
-        test_db.bind([Data, DataIndex], bind_refs=False, bind_backrefs=False)
+        test_db.bind(
+            [Data, DataIndex, DataBody, Bookmark],
+            bind_refs=False,
+            bind_backrefs=False,
+        )
         test_db.connect()
-        test_db.create_tables([Data, DataIndex])
+        test_db.create_tables([Data, DataIndex, Bookmark])
+        create_triggers()
         with test_db.atomic():
             number = 7540
             title = "Hypertext Transfer Protocol 2 (HTTP/2)"
@@ -24,18 +62,16 @@ class TestDB(unittest.TestCase):
             to as HTTP version 2 (HTTP/2).  HTTP/2 enables a more efficient 
             use of network"""
             category = "Standards Track"
-            bookmark = True
             Data.create(
                 number=number,
                 title=title,
                 text=text,
                 category=category,
-                bookmark=bookmark,
             )
-            DataIndex.create(rowid=number, title=title, text=text, category=category)
+            Bookmark.create(number=number, tags="http")
 
     def tearDown(self):
-        test_db.drop_tables([Data, DataIndex])
+        test_db.drop_tables([Data, DataIndex, DataBody, Bookmark])
         test_db.close()
 
     def test_db_connection(self):
@@ -58,15 +94,12 @@ class TestDB(unittest.TestCase):
             determining the addressing plan and address assignments within that
             network."""
             category = "Best Current Practice"
-            bookmark = False
             Data.create(
                 number=number,
                 title=title,
                 text=text,
                 category=category,
-                bookmark=bookmark,
             )
-            DataIndex.create(rowid=number, title=title, text=text, category=category)
 
             expected_title = [
                 "Hypertext Transfer Protocol 2 (HTTP/2)",
@@ -104,55 +137,285 @@ class TestDB(unittest.TestCase):
             self.assertNotEqual(result.title, "DNS")
 
     def test_search_by_bookmark(self):
-        query = Data.select().where(Data.bookmark == 1)
-        for result in query:
-            self.assertEqual(result.number, 7540)
-            self.assertNotEqual(result.number, 8305)
+        results = list(queries.bookmarks())
+        self.assertEqual([result.number for result in results], [7540])
+        self.assertEqual(results[0].title, "Hypertext Transfer Protocol 2 (HTTP/2)")
+        self.assertEqual(results[0].tags, "http")
+        self.assertEqual(len(queries.bookmarks(tag="http")), 1)
+        self.assertEqual(len(queries.bookmarks(tag="htt")), 0)
 
     def test_bookmarker(self):
-        with test_db.atomic():
-            number = 6555
-            title = "Happy Eyeballs test"
-            text = "testing bookmark"
-            category = "Best Current Practice"
-            bookmark = False
-            Data.create(
-                number=number,
-                title=title,
-                text=text,
-                category=category,
-                bookmark=bookmark,
-            )
-            DataIndex.create(rowid=number, title=title, text=text, category=category)
-
-        query = Data.select().where(Data.number == 6555)
-        for result in query:
-            self.assertEqual(result.bookmark, False)
-            Data.insert(
-                title=result.title,
-                text=result.text,
-                number=result.number,
-                category=result.category,
-                bookmark=1,
-            ).on_conflict("replace").execute()
-        new = Data.select().where(Data.number == 6555)
-        for result in new:
-            self.assertEqual(result.bookmark, True)
+        Data.create(number=6555, title="Happy Eyeballs", text="", category="")
+        self.assertEqual(add_bookmarks([6555, 7540], tags=["ipv6"], note="read"), 1)
+        bookmark = Bookmark.get_by_id(6555)
+        self.assertEqual((bookmark.tags, bookmark.note), ("ipv6", "read"))
+        self.assertIsNotNone(bookmark.created_at)
+        self.assertEqual(Bookmark.get_by_id(7540).tags, "http")
 
     def test_delete_bookmark(self):
-        exists = Data.select().where(Data.bookmark == 1 and Data.number == 7540)
-        for result in exists:
-            self.assertEqual(result.bookmark, True)
-            Data.insert(
-                title=result.title,
-                text=result.text,
-                number=result.number,
-                category=result.category,
-                bookmark=0,
-            ).on_conflict("replace").execute()
-        new = Data.select().where(Data.bookmark == 1 and Data.number == 7540)
-        for x in new:
-            self.assertEqual(x.bookmark, False)
+        self.assertEqual(remove_bookmarks([7540, 8305]), 1)
+        self.assertEqual(list(queries.bookmarks()), [])
+
+    def test_bookmarks_use_indexes(self):
+        sql, params = queries.bookmarks().sql()
+        plan = test_db.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+        self.assertEqual(
+            [row[-1] for row in plan],
+            [
+                "SCAN t1 USING INDEX bookmark_created_at",
+                "SEARCH t2 USING INTEGER PRIMARY KEY (rowid=?)",
+            ],
+        )
+
+    def test_bulk_insert(self):
+        titles = get_title_index(
+            "1918 Address Allocation. Y. Rekhter. February 1996.\n\n"
+            "7540 Hypertext Transfer Protocol. M. Belshe. May 2015.\n\n"
+            "8305 Happy Eyeballs. D. Schinazi. December 2017.\n"
+        )
+        documents = [
+            ("1918", "Best Current Practice private internets"),
+            ("7540", "duplicate of the row created in setUp"),
+            ("8305", "Standards Track happy eyeballs"),
+            ("rfc-ref", "not an rfc"),
+        ]
+        synchronous = test_db.pragma("synchronous")
+        inserted, elapsed = bulk_insert(build_rows(documents, titles), batch_size=2)
+        self.assertEqual(inserted, 2)
+        self.assertGreaterEqual(elapsed, 0)
+        self.assertEqual(test_db.pragma("synchronous"), synchronous)
+        self.assertEqual(Data.select().count(), 3)
+        self.assertEqual(Data.get_by_id(1918).category, "Best Current Practice")
+        self.assertEqual(Data.get_by_id(8305).title, "8305 Happy Eyeballs")
+        query = DataIndex.select().where(DataIndex.match("Happy"))
+        self.assertEqual([row.rowid for row in query], [8305])
+
+    def test_bulk_insert_retries_failed_batch(self):
+        rows = [(1, "0001 Host Software.", "text", "Unknown"), (7540, None, "", "")]
+        inserted, _ = bulk_insert(rows, batch_size=10)
+        self.assertEqual(inserted, 1)
+        self.assertTrue(Data.get_or_none(Data.number == 1))
+
+    @mock.patch("rfcpy.helpers.ingest.create_tables")
+    def test_pipeline_to_db(self, create_tables):
+        titles = get_title_index(
+            "\n\n".join(f"{n:04d} RFC {n}. A. Author. May 2015." for n in range(1, 300))
+        )
+        members = {f"rfc{n}.txt": f"Standards Track {n} " * 50 for n in range(1, 300)}
+        members["rfc-index.txt"] = "skipped"
+        inserted, _ = pipeline_to_db(tar_chunks(members), titles, workers=2)
+        self.assertEqual(inserted, 299)
+        self.assertEqual(Data.select().count(), 300)
+        self.assertEqual(Data.get_by_id(42).title, "0042 RFC 42")
+
+    @mock.patch("rfcpy.helpers.ingest.create_tables")
+    def test_pipeline_failure_writes_nothing(self, create_tables):
+        titles = get_title_index("0001 RFC 1. A. Author. May 2015.")
+        chunks = tar_chunks({f"rfc{n}.txt": "text " * 1000 for n in range(1, 50)})
+
+        def dropped_connection():
+            yield from chunks[:3]
+            raise ConnectionError("connection reset")
+
+        with self.assertRaises(ConnectionError):
+            pipeline_to_db(dropped_connection(), titles, workers=1, batch_size=1)
+        self.assertEqual(Data.select().count(), 1)
+
+    def test_find_stale_rfcs(self):
+        index = get_title_index(
+            "7540 Hypertext Transfer Protocol 2 (HTTP/2). M. Belshe. May 2015.\n\n"
+            "7541 HPACK. R. Peon. May 2015.\n\n"
+            "8000 Not Issued.\n\n"
+            "9113 HTTP/2. M. Thomson, Ed.. June 2022.\n"
+        )
+        Data.create(number=9000, title="9000 QUIC", text="", category="")
+        missing, changed, revised = find_stale_rfcs(index)
+        # 7541 is below the highest local number but still missing
+        self.assertEqual(missing, [7541, 9113])
+        self.assertEqual(list(changed), [7540])
+        self.assertEqual(changed[7540].published, date(2015, 5, 1))
+        # stored without a checksum, only its index entry is corrected
+        self.assertEqual(revised, [])
+        Data.update(checksum="x").execute()
+        self.assertEqual(find_stale_rfcs(index)[2], [7540])
+        entry = changed[7540]
+        Data.update(title=entry.heading, published=entry.published).execute()
+        self.assertEqual(find_stale_rfcs(index)[1], {})
+
+    def test_upsert_rows(self):
+        entry = get_title_index("7540 HTTP/2. M. Belshe. May 2015.")[7540]
+        unchanged = Data.get_by_id(7540)
+        row = (7540, unchanged.title, unchanged.text, unchanged.category, None, None)
+        self.assertEqual(upsert_rows([row]), 0)
+        rows = [
+            make_row(7540, entry, "Standards Track revised"),
+            (9113, "9113 HTTP/2", "Proposed Standard", "Standards Track", "x", None),
+        ]
+        self.assertEqual(upsert_rows(rows), 2)
+        updated = Data.get_by_id(7540)
+        self.assertEqual(updated.title, "7540 HTTP/2")
+        self.assertEqual(updated.checksum, checksum("Standards Track revised"))
+        self.assertEqual(updated.published, date(2015, 5, 1))
+        self.assertTrue(Bookmark.get_or_none(Bookmark.number == 7540))
+        self.assertEqual(DataIndex.get(DataIndex.rowid == 7540).title, "7540 HTTP/2")
+        self.assertTrue(Data.get_or_none(Data.number == 9113))
+
+    @mock.patch("rfcpy.helpers.ingest.fetch_rfcs")
+    def test_apply_index(self, fetch_rfcs):
+        index = get_title_index(
+            "7540 HTTP/2. M. Belshe. May 2015.\n\n"
+            "7541 HPACK. R. Peon. May 2015.\n\n"
+            "9113 HTTP/2. M. Thomson, Ed.. June 2022.\n"
+        )
+        # 7541 has no txt version yet, 7540 retitled in the index is fetched
+        # again and only rewritten because its text changed
+        Data.update(checksum="x").execute()
+        text = Data.get_by_id(7540).text
+        fetch_rfcs.return_value = [(7540, text), (9113, "HTTP/2 revised")]
+        with mock.patch("sys.stdout"):
+            apply_index(index)
+        fetch_rfcs.assert_called_once_with([7540, 7541, 9113])
+        self.assertEqual(Data.get_by_id(7540).checksum, checksum(text))
+        self.assertEqual([rfc.number for rfc in Data.select()], [7540, 9113])
+
+        fetch_rfcs.reset_mock()
+        fetch_rfcs.return_value = [(7541, "HPACK")]
+        with mock.patch("sys.stdout"):
+            apply_index(index)
+        # only the RFC missed by the last update is requested again
+        fetch_rfcs.assert_called_once_with([7541])
+        self.assertEqual(Data.get_by_id(7541).text, "HPACK")
+
+    def test_latest(self):
+        for number in (999, 9999, 10000):
+            Data.create(number=number, title=f"{number} RFC", text="", category="")
+        latest = queries.latest(3)
+        self.assertEqual([rfc.number for rfc in latest], [10000, 9999, 7540])
+        plan = test_db.execute_sql(
+            "EXPLAIN QUERY PLAN " + latest.sql()[0], latest.sql()[1]
+        )
+        self.assertEqual(
+            [row[-1] for row in plan],
+            ["SCAN t1 USING COVERING INDEX data_number_title_category"],
+        )
+
+    def test_list_views_skip_text(self):
+        for query in (queries.latest(), queries.search("HTTP"), queries.bookmarks()):
+            for result in query:
+                self.assertEqual(result.number, 7540)
+                self.assertNotIn("text", result.__data__)
+
+    def test_compressed_text(self):
+        text = "Standards Track " * 200
+        for algorithm in ("zlib", "lzma"):
+            with mock.patch.object(Config, "COMPRESSION", algorithm):
+                Data.insert(
+                    number=1, title="0001 Host", text=text, category="Historic"
+                ).on_conflict("replace").execute()
+            stored = test_db.execute_sql(
+                "SELECT typeof(text), length(text) FROM data WHERE number = 1"
+            ).fetchone()
+            self.assertEqual(stored[0], "blob")
+            self.assertLess(stored[1], len(text))
+            self.assertEqual(Data.get_by_id(1).text, text)
+
+    def test_migrate_compression(self):
+        plain = Data.get_by_id(7540).text
+        with mock.patch.object(Config, "COMPRESSION", "zlib"):
+            self.assertEqual(migrate_compression(), 1)
+            self.assertEqual(migrate_compression(), 0)
+        self.assertEqual(Data.get_by_id(7540).text, plain)
+        self.assertEqual(migrate_compression(), 1)
+        stored = test_db.execute_sql("SELECT text FROM data").fetchone()[0]
+        self.assertEqual(stored, plain)
+
+    def test_maintain_database(self):
+        def segments():
+            # the structure record lists every segment of the index
+            return test_db.execute_sql(
+                "SELECT length(block) FROM dataindex_data WHERE id = 10"
+            ).fetchone()[0]
+
+        for number in range(1, 30):
+            Data.create(number=number, title=f"{number} T", text="", category="x")
+        fragmented = segments()
+        maintain_database()
+        self.assertLess(segments(), fragmented)
+        config = dict(test_db.execute_sql("SELECT k, v FROM dataindex_config"))
+        self.assertEqual(config["automerge"], Config.FTS_AUTOMERGE)
+        self.assertEqual(config["crisismerge"], Config.FTS_CRISISMERGE)
+        self.assertTrue(test_db.table_exists("sqlite_stat1"))
+        self.assertEqual(queries.search("T").count(), 29)
+
+    def test_query_cache(self):
+        queries.CACHE.clear()
+        queries.CACHE.hits = queries.CACHE.misses = 0
+        rfc = queries.get_rfc("7540")
+        self.assertIs(queries.get_rfc(7540), rfc)
+        self.assertEqual(queries.search_results("HTTP")[0].number, 7540)
+        self.assertEqual(queries.search_results("HTTP")[0].number, 7540)
+        stats = queries.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+        self.assertGreater(stats["bytes"], len(rfc.text))
+
+        # writes by an update bump the generation, emptying the cache
+        generation_before = generation()
+        entry = get_title_index("9113 HTTP/2. M. Thomson. June 2022.")[9113]
+        bulk_insert([make_row(9113, entry, "Standards Track")])
+        self.assertEqual(generation(), generation_before + 1)
+        self.assertEqual(len(queries.search_results("HTTP")), 2)
+        self.assertIsNot(queries.get_rfc(7540), rfc)
+        with mock.patch.object(queries.CACHE, "max_bytes", 0):
+            self.assertIsNot(queries.get_rfc(7540), queries.get_rfc(7540))
+
+    def test_index_follows_data(self):
+        def matches(phrase):
+            return DataIndex.select().where(DataIndex.match(phrase)).count()
+
+        Data.update(title="7540 HTTP/2").where(Data.number == 7540).execute()
+        self.assertEqual(matches("Hypertext"), 0)
+        self.assertEqual(matches("HTTP"), 1)
+        Data.delete_by_id(7540)
+        self.assertEqual(matches("HTTP"), 0)
+
+    def test_migrate_search_index(self):
+        self.assertFalse(migrate_search_index())
+        test_db.execute_sql("DROP TABLE dataindex")
+        test_db.execute_sql(
+            "CREATE VIRTUAL TABLE dataindex USING fts5 "
+            "(title, text UNINDEXED, category, tokenize='porter')"
+        )
+        self.assertTrue(migrate_search_index())
+        sql = test_db.execute_sql(
+            "SELECT sql FROM sqlite_master WHERE name = 'dataindex'"
+        ).fetchone()[0]
+        self.assertIn('content="data"', sql)
+        query = DataIndex.select().where(DataIndex.match("Hypertext"))
+        self.assertEqual([row.rowid for row in query], [7540])
+
+    def test_search_body(self):
+        self.assertEqual(build_body_index(), 1)
+        rows = [(1918, "1918 Private Internets", "TCP/IP network addressing", "", "")]
+        bulk_insert(rows)
+        total, page = queries.search_body("network", limit=1)
+        self.assertEqual(total, 2)
+        results = list(page)
+        self.assertEqual(len(results), 1)
+        self.assertIn("[network]", results[0].snippet)
+        total, page = queries.search_body("hypertext", offset=0)
+        self.assertEqual(total, 1)
+        self.assertEqual(
+            list(page)[0].title, "[Hypertext] Transfer Protocol 2 (HTTP/2)"
+        )
+
+    def test_random_rfc(self):
+        Data.create(number=1, title="0001 Host Software", text="", category="")
+        numbers = {queries.random_rfc().number for _ in range(50)}
+        self.assertLessEqual(numbers, {1, 7540})
+        with mock.patch("random.randint", return_value=2):
+            self.assertEqual(queries.random_rfc(attempts=3).number, 7540)
+        Data.delete().execute()
+        self.assertIsNone(queries.random_rfc())
 
     def test_number_does_not_exist(self):
         query = Data.select().where(Data.number == 8305)
@@ -173,5 +436,207 @@ class TestDB(unittest.TestCase):
             self.assertEqual(result.title, "")
 
 
+class TestMigrations(DatabaseTestCase):
+    """Test upgrading a database created by the first release."""
+
+    def create_database(self):
+        create_baseline_database(self.path)
+
+    def test_create_tables(self):
+        create_tables()
+        create_tables()  # already migrated, nothing to do
+        with db:
+            columns = [column.name for column in db.get_columns("data")]
+            self.assertEqual(
+                sorted(columns),
+                ["category", "checksum", "number", "published", "text", "title"],
+            )
+            indexed = db.execute_sql("PRAGMA index_info(data_published)").fetchall()
+            self.assertEqual([row[2] for row in indexed], ["published"])
+            check = db.execute_sql("PRAGMA integrity_check").fetchall()
+            self.assertEqual(check, [("ok",)])
+            self.assertEqual([r.number for r in queries.search("TLS")], [8446])
+
+    @mock.patch("rfcpy.helpers.ingest.fetch_rfcs", return_value=[])
+    def test_first_update(self, fetch_rfcs):
+        create_tables()
+        index = get_title_index(
+            "7540 HTTP/2. M. Belshe. May 2015.\n\n"
+            "8446 TLS 1.3. E. Rescorla. August 2018.\n\n"
+            "9113 HTTP/2. M. Thomson, Ed.. June 2022.\n"
+        )
+        with db, mock.patch("sys.stdout"):
+            apply_index(index)
+            # rows without a checksum or date are corrected from the index,
+            # only the RFC missing from the database is downloaded
+            fetch_rfcs.assert_called_once_with([9113])
+            self.assertEqual(Data.get_by_id(8446).published, date(2018, 8, 1))
+            self.assertEqual(find_stale_rfcs(index)[1:], ({}, []))
+
+    def test_migrate_bookmarks(self):
+        create_tables()
+        with db:
+            bookmarks = [result.number for result in queries.bookmarks()]
+            self.assertEqual(bookmarks, [7540])
+            columns = [column.name for column in db.get_columns("data")]
+            self.assertNotIn("bookmark", columns)
+            self.assertEqual(migrate_bookmarks(), 0)
+            # the standalone index was replaced and still finds every RFC
+            self.assertEqual([r.number for r in queries.search("HTTP")], [7540])
+            self.assertEqual(
+                [r.number for r in queries.search("Standards")], [7540, 8446]
+            )
+
+
+class TestShadowDatabase(DatabaseTestCase):
+    """Test rebuilding the database in a shadow file on disk."""
+
+    def setUp(self):
+        super().setUp()
+        with db:
+            Data.create(number=1, title="0001 Old", text="old", category="x")
+            Bookmark.create(number=2, tags="kept", note="note")
+
+    def test_swap(self):
+        with db:
+            bump_generation()
+        reader = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        reader.execute("BEGIN")
+        self.assertEqual(reader.execute("SELECT count(*) FROM data").fetchone(), (1,))
+        with shadow_database():
+            self.assertEqual(db.database, f"{self.path}.shadow")
+            Data.create(number=2, title="0002 New", text="new", category="x")
+            with shadow_database():  # nested blocks join the outer rebuild
+                Data.create(number=3, title="0003 New", text="new", category="x")
+            # the live database is untouched until the block ends
+            self.assertEqual(
+                reader.execute("SELECT number FROM data").fetchall(), [(1,)]
+            )
+        self.assertEqual(reader.execute("SELECT number FROM data").fetchall(), [(1,)])
+        reader.close()
+
+        self.assertEqual(db.database, self.path)
+        self.assertFalse([f for f in os.listdir(Config.TESTS_FOLDER) if "shadow" in f])
+        self.assertEqual([rfc.number for rfc in Data.select()], [2, 3])
+        self.assertEqual(generation(), 2)
+        bookmark = Bookmark.get()
+        self.assertEqual((bookmark.number, bookmark.tags), (2, "kept"))
+        self.assertEqual([r.number for r in queries.search("New")], [2, 3])
+
+    def test_failed_rebuild_keeps_database(self):
+        with self.assertRaises(ValueError):
+            with shadow_database():
+                Data.create(number=2, title="0002 New", text="new", category="x")
+                raise ValueError
+        self.assertEqual(db.database, self.path)
+        self.assertFalse([f for f in os.listdir(Config.TESTS_FOLDER) if "shadow" in f])
+        self.assertEqual([rfc.number for rfc in Data.select()], [1])
+
+    def test_open_readers_stay_valid(self):
+        # a connection held open across the swap, e.g. by `rfc serve`
+        reader = sqlite3.connect(self.path)
+        self.assertEqual(reader.execute("SELECT count(*) FROM data").fetchone(), (1,))
+        with shadow_database():
+            rows = [(n, f"{n:04} New", "new", "x", None, None) for n in range(2, 50)]
+            bulk_insert(rows)
+        bulk_insert([(50, "0050 Later", "later", "x", None, None)])
+        self.assertEqual(reader.execute("PRAGMA integrity_check").fetchall(), [("ok",)])
+        self.assertEqual(reader.execute("SELECT count(*) FROM data").fetchone(), (49,))
+        reader.close()
+
+    def test_body_index_is_kept(self):
+        with db:
+            build_body_index()
+        with shadow_database():
+            entry = get_title_index("0002 New. A. Author. May 2015.")[2]
+            bulk_insert([make_row(2, entry, "body text")])
+        self.assertEqual([row.number for row in queries.search_body("body")[1]], [2])
+
+
+class TestConnectionPool(DatabaseTestCase):
+    """Test pooled connections shared by reader and writer threads."""
+
+    def setUp(self):
+        super().setUp()
+        with db:
+            Data.create(number=1, title="0001 Host Software", text="", category="x")
+
+    def run_threads(self, target, count=8):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_read_only_connections(self):
+        open_read_only()
+        with db.connection_context():
+            pragma = lambda name: db.execute_sql(f"PRAGMA {name}").fetchone()[0]
+            self.assertEqual(pragma("mmap_size"), Config.SQLITE_MMAP_SIZE)
+            self.assertEqual(pragma("cache_size"), Config.SQLITE_CACHE_SIZE)
+            self.assertEqual(pragma("busy_timeout"), Config.BUSY_TIMEOUT)
+            self.assertEqual(pragma("query_only"), 1)
+            with self.assertRaises(DatabaseError):
+                Bookmark.create(number=1)
+
+    def test_concurrent_readers(self):
+        open_read_only()
+        counts = []
+
+        def read():
+            for _ in range(20):
+                with db.connection_context():
+                    counts.append(Data.select().count())
+
+        self.run_threads(read)
+        self.assertEqual(counts, [1] * 160)
+        # every connection went back to the pool to be reused
+        self.assertFalse(db._in_use)
+        self.assertLessEqual(len(db._connections), 8)
+
+    def test_concurrent_writers(self):
+        numbers = iter(range(1000))
+
+        def write():
+            for _ in range(10):
+                with db.connection_context():
+                    add_bookmarks([next(numbers)])
+
+        self.run_threads(write)
+        self.assertEqual(Bookmark.select().count(), 80)
+
+    def test_writers_wait_for_each_other(self):
+        maintained = threading.Event()
+
+        def maintain():
+            with db.connection_context():
+                maintain_database()
+            maintained.set()
+
+        with db.connection_context(), writer():
+            thread = threading.Thread(target=maintain)
+            thread.start()
+            self.assertFalse(maintained.wait(0.2))
+            Bookmark.create(number=1)
+        thread.join()
+        self.assertTrue(maintained.is_set())
+
+    def test_stale_connections_are_closed(self):
+        with db.connection_context():
+            pass
+        self.assertTrue(db._connections)
+        with mock.patch.object(db, "_stale_timeout", -1):
+            with db.connection_context():
+                self.assertFalse(db._connections)
+            self.assertFalse(db._connections)
+
+    def test_init_closes_pool(self):
+        with db.connection_context():
+            pass
+        self.assertTrue(db._connections)
+        open_read_only()
+        self.assertFalse(db._connections)
+
+
 if __name__ == "__main__":
     unittest.main()
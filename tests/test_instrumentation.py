@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from rfcpy.helpers.config import Config
+from rfcpy.helpers.instrumentation import (REGISTRY, Histogram, JSONSink,
+                                           LogSink, PrometheusSink, flush, inc,
+                                           observe, span, timed)
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test metrics collection and the sinks they are written to."""
+
+    def setUp(self):
+        REGISTRY.clear()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        REGISTRY.clear()
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(1, 2, 3))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.5, 1.5, 1.5, 2.5, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.sum, 16)
+        self.assertEqual(histogram.quantile(0.5), 2)
+        self.assertEqual(histogram.quantile(1), float("inf"))
+        self.assertEqual(
+            histogram.cumulative(), [(1, 1), (2, 3), (3, 4), (float("inf"), 5)]
+        )
+
+    def test_counters_and_spans(self):
+        inc("rows_inserted", 10)
+        inc("rows_inserted", 5)
+        with span("query", query="search"):
+            pass
+
+        @timed("stage")
+        def stage():
+            """Docstring kept."""
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            stage()
+        self.assertEqual(stage.__name__, "stage")
+        snapshot = REGISTRY.snapshot()
+        self.assertEqual(
+            snapshot["counters"],
+            [{"name": "rows_inserted", "labels": {}, "value": 15}],
+        )
+        names = [(h["name"], h["labels"], h["count"]) for h in snapshot["histograms"]]
+        self.assertEqual(
+            names,
+            [("query_seconds", {"query": "search"}, 1), ("stage_seconds", {}, 1)],
+        )
+
+    def test_sinks(self):
+        inc("bytes_downloaded", 2048)
+        observe("query_seconds", 0.003, query="get")
+        with self.assertLogs("rfcpy.metrics", logging.INFO) as logs:
+            flush([LogSink(), JSONSink(self.path("metrics.json"))])
+        self.assertIn("INFO:rfcpy.metrics:bytes_downloaded 2048", logs.output)
+        with open(self.path("metrics.json")) as f:
+            self.assertEqual(json.load(f)["counters"][0]["value"], 2048)
+
+        flush([PrometheusSink(self.path("rfcpy.prom"))])
+        with open(self.path("rfcpy.prom")) as f:
+            lines = f.read().splitlines()
+        self.assertIn("# TYPE rfcpy_bytes_downloaded_total counter", lines)
+        self.assertIn("rfcpy_bytes_downloaded_total 2048", lines)
+        self.assertIn('rfcpy_query_seconds_bucket{le="0.0025",query="get"} 0', lines)
+        self.assertIn('rfcpy_query_seconds_bucket{le="+Inf",query="get"} 1', lines)
+        self.assertIn('rfcpy_query_seconds_count{query="get"} 1', lines)
+        self.assertEqual(os.listdir(self.directory.name), ["metrics.json", "rfcpy.prom"])
+
+    def test_flush_uses_config(self):
+        inc("files_parsed")
+        flush()  # no sinks configured, nothing is written
+        self.assertEqual(os.listdir(self.directory.name), [])
+        with mock.patch.object(Config, "METRICS_TEXTFILE", self.path("rfcpy.prom")):
+            flush()
+        self.assertTrue(os.path.exists(self.path("rfcpy.prom")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+import responses
+from responses import matchers
+
+from rfcpy.helpers.config import Config
+from rfcpy.helpers.network import (conditional_get, download_rfc_tar,
+                                   fetch_index, forget_validators, get_session,
+                                   load_validators, split_ranges)
+
+ARCHIVE = os.urandom(300_000)
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    """Serves ARCHIVE like rfc-editor.org, with Range, ETag and HEAD support.
+    Behaviour is adjusted through attributes on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_archive_headers(self, status, length, first=0):
+        server = self.server
+        self.send_response(status)
+        self.send_header("ETag", server.etag)
+        if server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            last = first + length - 1
+            self.send_header("Content-Range", f"bytes {first}-{last}/{len(ARCHIVE)}")
+        if server.content_length:
+            self.send_header("Content-Length", str(length))
+        else:
+            self.send_header("Connection", "close")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.server.requests.append(("HEAD", None))
+        self.send_archive_headers(200, len(ARCHIVE))
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        self.server.requests.append(("GET", header))
+        if self.server.unavailable:
+            self.server.unavailable -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body, status, first = ARCHIVE, 200, 0
+        if header and self.server.ranges:
+            first, _, last = header[len("bytes=") :].partition("-")
+            first = int(first)
+            last = int(last) if last else len(ARCHIVE) - 1
+            body, status = ARCHIVE[first : last + 1], 206
+        self.send_archive_headers(status, len(body), first)
+        if self.server.drop_after:
+            body = body[: self.server.drop_after]
+            self.server.drop_after = None
+            self.wfile.write(body)
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+        if not self.server.content_length:
+            self.close_connection = True
+
+
+class TestDownload(unittest.TestCase):
+    """Test the tarball download against a local HTTP server."""
+
+    def setUp(self):
+        os.makedirs(Config.TESTS_FOLDER, exist_ok=True)
+        self.path = os.path.join(Config.TESTS_FOLDER, Config.FILENAME)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+        self.server.etag = '"v1"'
+        self.server.ranges = True
+        self.server.content_length = True
+        self.server.drop_after = None
+        self.server.unavailable = 0
+        self.server.requests = []
+        self.url = f"http://127.0.0.1:{self.server.server_port}/RFC-all.tar.gz"
+        serve = lambda: self.server.serve_forever(poll_interval=0.05)
+        threading.Thread(target=serve, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(Config.TESTS_FOLDER)
+
+    def download(self, **kwargs):
+        return download_rfc_tar(url=self.url, path=self.path, **kwargs)
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_split_ranges(self):
+        self.assertEqual(split_ranges(10, 3), [(0, 3), (4, 7), (8, 9)])
+        self.assertEqual(split_ranges(2, 4), [(0, 0), (1, 1)])
+
+    def test_parallel_download(self):
+        self.assertTrue(self.download(workers=3))
+        self.assertEqual(self.read(), ARCHIVE)
+        ranges = [header for method, header in self.server.requests if header]
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(
+            sorted(os.listdir(Config.TESTS_FOLDER)),
+            [Config.FILENAME, f"{Config.FILENAME}.json"],
+        )
+
+    def test_unchanged_archive_is_skipped(self):
+        self.download()
+        self.server.requests.clear()
+        self.assertFalse(self.download())
+        self.assertEqual(self.server.requests, [("HEAD", None)])
+        self.server.etag = '"v2"'
+        self.assertTrue(self.download())
+
+    def test_resume_partial_download(self):
+        self.download(workers=2)
+        os.remove(self.path)
+        with open(f"{self.path}.json") as f:
+            state = json.load(f)
+        del state["sha256"]
+        state["ranges"] = [[0, len(ARCHIVE) - 1]]
+        state["parts"] = [f"{self.path}.part0"]
+        with open(f"{self.path}.json", "w") as f:
+            json.dump(state, f)
+        with open(state["parts"][0], "wb") as f:
+            f.write(ARCHIVE[:1000])
+        self.server.requests.clear()
+        self.download()
+        self.assertEqual(self.read(), ARCHIVE)
+        self.assertIn(("GET", f"bytes=1000-{len(ARCHIVE) - 1}"), self.server.requests)
+
+    def test_resume_dropped_connection(self):
+        self.server.drop_after = 5000
+        with mock.patch.object(Config, "DOWNLOAD_CHUNK_SIZE", 1000):
+            self.download(workers=1)
+        self.assertEqual(self.read(), ARCHIVE)
+        headers = [header for method, header in self.server.requests if method == "GET"]
+        self.assertEqual(headers[-1], f"bytes=5000-{len(ARCHIVE) - 1}")
+
+    def test_without_ranges_or_length(self):
+        self.server.ranges = False
+        self.server.content_length = False
+        self.assertTrue(self.download(workers=4))
+        self.assertEqual(self.read(), ARCHIVE)
+
+    def test_retries_unavailable_server(self):
+        self.server.unavailable = 2
+        self.assertTrue(self.download(workers=1))
+        self.assertEqual(self.read(), ARCHIVE)
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_checksum(self):
+        digest = hashlib.sha256(ARCHIVE).hexdigest()
+        self.assertTrue(self.download(sha256=digest))
+        os.remove(self.path)
+        with self.assertRaises(OSError):
+            self.download(sha256="0" * 64)
+        self.assertFalse(os.path.exists(self.path))
+
+
+class TestTransport(unittest.TestCase):
+    """Test the shared session and the validator cache."""
+
+    def setUp(self):
+        os.makedirs(Config.TESTS_FOLDER, exist_ok=True)
+        path = os.path.join(Config.TESTS_FOLDER, "validators.json")
+        self.patcher = mock.patch.object(Config, "VALIDATORS_FILE", path)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(Config.TESTS_FOLDER)
+
+    def test_session_is_shared(self):
+        session = get_session()
+        self.assertIs(session, get_session())
+        adapter = session.get_adapter(Config.INDEX_URL)
+        self.assertEqual(adapter.max_retries.total, Config.HTTP_RETRIES)
+        self.assertEqual(adapter._pool_maxsize, Config.HTTP_POOL_SIZE)
+
+    @responses.activate
+    def test_unchanged_index_is_not_modified(self):
+        responses.add(
+            responses.GET,
+            Config.INDEX_URL,
+            body="7540 HTTP/2.",
+            headers={"ETag": '"abc"', "Last-Modified": "Tue, 01 Mar 2022 00:00:00 GMT"},
+        )
+        self.assertEqual(fetch_index(conditional=True), "7540 HTTP/2.")
+        self.assertEqual(load_validators()[Config.INDEX_URL]["etag"], '"abc"')
+        responses.replace(
+            responses.GET,
+            Config.INDEX_URL,
+            status=304,
+            match=[
+                matchers.header_matcher(
+                    {
+                        "If-None-Match": '"abc"',
+                        "If-Modified-Since": "Tue, 01 Mar 2022 00:00:00 GMT",
+                    }
+                )
+            ],
+        )
+        self.assertIsNone(fetch_index(conditional=True))
+        forget_validators(Config.INDEX_URL)
+        self.assertEqual(load_validators(), {})
+
+    @responses.activate
+    def test_conditional_get_errors(self):
+        responses.add(responses.GET, Config.INDEX_URL, status=404)
+        with self.assertRaises(requests.HTTPError):
+            conditional_get(Config.INDEX_URL)
+        self.assertEqual(load_validators(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import gzip
+import threading
+import unittest
+from datetime import date
+
+import requests
+
+from rfcpy.models import Bookmark, Data, db, open_read_only
+from rfcpy.server import RFCServer
+from tests.helpers import DatabaseTestCase
+
+
+class TestServer(DatabaseTestCase):
+    """Test the HTTP interface against a read-only database on disk."""
+
+    def setUp(self):
+        super().setUp()
+        with db:
+            Data.create(
+                number=8446,
+                title="8446 The Transport Layer Security (TLS) Protocol",
+                text="TLS " * 1000,
+                category="Standards Track",
+                published=date(2018, 8, 1),
+            )
+            Data.create(
+                number=9000,
+                title="9000 QUIC",
+                text="QUIC",
+                category="Standards Track",
+            )
+            Bookmark.create(number=9000, tags="quic")
+        open_read_only()
+        self.server = RFCServer(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        serve = lambda: self.server.serve_forever(poll_interval=0.05)
+        threading.Thread(target=serve, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def get(self, path, **headers):
+        return requests.get(self.url + path, headers=headers)
+
+    def test_rfc(self):
+        r = self.get("/rfc/8446")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.headers["Content-Type"], "application/json")
+        rfc = r.json()
+        self.assertEqual(rfc["title"], "The Transport Layer Security (TLS) Protocol")
+        self.assertEqual(rfc["published"], "2018-08-01")
+        self.assertEqual(rfc["text"], "TLS " * 1000)
+        for path in ("/rfc/1", "/rfc/x", "/nope", "/rfc", "/rfc/8446/x"):
+            self.assertEqual(self.get(path).status_code, 404, path)
+
+    def test_lists(self):
+        r = self.get("/search?q=tls&limit=5")
+        self.assertEqual([result["number"] for result in r.json()], [8446])
+        self.assertEqual(self.get("/search?q=%20").status_code, 400)
+        self.assertEqual(self.get("/search?q=tls&limit=x").status_code, 400)
+        self.assertEqual(self.get("/search?q=tls&limit=-1").status_code, 400)
+        r = self.get("/search?q=AND")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("cannot search for 'AND'", r.json()["error"])
+        r = self.get("/latest?n=1")
+        self.assertEqual(
+            r.json(), [{"number": 9000, "title": "QUIC", "category": "Standards Track"}]
+        )
+        self.assertEqual(len(self.get("/bookmarks?tag=quic").json()), 1)
+        self.assertEqual(self.get("/bookmarks?tag=tls").json(), [])
+
+    def test_etag_and_gzip(self):
+        r = self.get("/rfc/8446", **{"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", r.headers)
+        tag = r.headers["ETag"]
+        headers = {"If-None-Match": tag, "Accept-Encoding": "identity"}
+        r = self.get("/rfc/8446", **headers)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.content, b"")
+
+        r = requests.get(
+            self.url + "/rfc/8446", headers={"Accept-Encoding": "gzip"}, stream=True
+        )
+        self.assertEqual(r.headers["Content-Encoding"], "gzip")
+        self.assertNotEqual(r.headers["ETag"], tag)
+        raw = r.raw.read()
+        self.assertEqual(int(r.headers["Content-Length"]), len(raw))
+        self.assertIn(b"TLS TLS", gzip.decompress(raw))
+        # small responses are not compressed
+        r = self.get("/latest", **{"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", r.headers)
+
+    def test_head(self):
+        r = requests.head(self.url + "/rfc/9000")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(int(r.headers["Content-Length"]))
+        self.assertEqual(r.content, b"")
+
+    def test_concurrent_requests(self):
+        session = requests.Session()
+        results = []
+
+        def fetch():
+            for _ in range(20):
+                results.append(session.get(self.url + "/rfc/9000").status_code)
+
+        threads = [threading.Thread(target=fetch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        session.close()
+        self.assertEqual(results, [200] * 80)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+import unittest
+
+# cumulative import time allowed for the rfc entry point, in microseconds.
+IMPORT_BUDGET_US = 300000
+# only needed when downloading or writing RFC's to the database.
+UPDATE_ONLY_MODULES = {
+    "requests",
+    "tarfile",
+    "configparser",
+    "playhouse.migrate",
+    "rfcpy.helpers.ingest",
+    "rfcpy.helpers.network",
+    "rfcpy.helpers.pipeline",
+}
+
+
+def import_times(module):
+    """Import module in a fresh interpreter using python -X importtime.
+
+    :return dict of {module name: cumulative import time in microseconds}
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup(unittest.TestCase):
+    """Cold start cost of the entry point modules."""
+
+    def test_cli_skips_update_modules(self):
+        times = import_times("rfcpy.cli")
+        self.assertFalse(UPDATE_ONLY_MODULES & times.keys())
+
+    def test_interactive_skips_update_modules(self):
+        times = import_times("rfcpy.rfc")
+        self.assertFalse(UPDATE_ONLY_MODULES & times.keys())
+
+    def test_cli_import_budget(self):
+        times = import_times("rfcpy.cli")
+        self.assertLess(times["rfcpy.cli"], IMPORT_BUDGET_US)
+
+
+if __name__ == "__main__":
+    unittest.main()
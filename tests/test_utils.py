@@ -1,15 +1,50 @@
+import io
 import os
 import shutil
+import tarfile
 import unittest
-from datetime import datetime
+from datetime import date, datetime
 
 import requests
 import responses
 from requests.exceptions import ConnectionError, ConnectTimeout
 
-from rfcpy.helpers.utils import (Config, create_config, get_categories,
-                                 read_last_conf_update, sanitize_inputs,
-                                 update_config)
+from rfcpy.helpers.ingest import (get_title_index, iter_tar_rfcs,
+                                  parse_document, parse_in_parallel,
+                                  read_tar_index)
+from rfcpy.helpers.utils import (Config, classify_categories, create_config,
+                                 get_categories, read_last_conf_update,
+                                 sanitize_inputs, update_config)
+
+RFC_INDEX = """
+                               RFC INDEX
+                             -------------
+
+0080 Protocols and Data Formats. E. Harslem, J.F. Heafner. December 1970.
+     (Format: TXT=1795 bytes) (Status: UNKNOWN) (DOI: 10.17487/RFC0080)
+
+8000 Not Issued.
+
+8446 The Transport Layer Security (TLS) Protocol Version 1.3. E.
+     Rescorla. August 2018. (Format: HTML, TXT, PDF, XML) (Obsoletes
+     RFC5077, RFC5246, RFC6961) (Updates RFC5705, RFC6066) (Status:
+     PROPOSED STANDARD) (Stream: IETF) (DOI: 10.17487/RFC8446)
+
+9000 QUIC: A UDP-Based Multiplexed and Secure Transport. J. Iyengar, Ed., M.
+     Thomson, Ed.. May 2021. (Obsoleted by RFC9999) (Status: PROPOSED
+     STANDARD) (Stream: IETF) (DOI: 10.17487/RFC9000)
+"""
+
+
+def make_tar(path, members):
+    """Write a tar.gz at path containing {filename: text} members."""
+
+    with tarfile.open(path, "w:gz") as tar:
+        for name, text in members.items():
+            data = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
 
 
 class TestUtils(unittest.TestCase):
@@ -36,6 +71,57 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(result, "Historic")
         self.assertNotEqual(result, "Informational")
 
+    def test_categories_first_match_wins(self):
+        text = "Category: informational\nObsoletes an EXPERIMENTAL protocol"
+        self.assertEqual(get_categories(text), "Informational")
+        late = " " * 500 + "Historic"
+        self.assertEqual(
+            classify_categories([text, late, "BEST CURRENT PRACTICE"]),
+            ["Informational", "Uncategorised", "Best Current Practice"],
+        )
+
+    def test_title_index(self):
+        index = get_title_index(RFC_INDEX)
+        self.assertCountEqual(index.keys(), [80, 8000, 8446, 9000])
+        tls = index[8446]
+        self.assertEqual(
+            tls.title, "The Transport Layer Security (TLS) Protocol Version 1.3"
+        )
+        self.assertEqual(tls.heading, f"8446 {tls.title}")
+        self.assertEqual(tls.authors, ("E. Rescorla",))
+        self.assertEqual(tls.date, "August 2018")
+        self.assertEqual(tls.obsoletes, (5077, 5246, 6961))
+        self.assertEqual(tls.updates, (5705, 6066))
+        self.assertEqual(tls.status, "PROPOSED STANDARD")
+        self.assertEqual(index[80].heading, "0080 Protocols and Data Formats")
+        self.assertEqual(index[80].authors, ("E. Harslem", "J.F. Heafner"))
+        self.assertEqual(index[8000].title, "Not Issued")
+        self.assertEqual(index[9000].authors, ("J. Iyengar, Ed.", "M. Thomson, Ed."))
+        self.assertEqual(index[9000].obsoleted_by, (9999,))
+        self.assertEqual(tls.published, date(2018, 8, 1))
+        self.assertIsNone(index[8000].published)
+
+    def test_title_index_five_digit_numbers(self):
+        index = get_title_index(
+            "10000 Future Protocol. A. Author. 1 April 2030. (Status: UNKNOWN)\n"
+        )
+        self.assertEqual(index[10000].heading, "10000 Future Protocol")
+        self.assertEqual(index[10000].published, date(2030, 4, 1))
+
+    def test_parse_in_parallel_matches_serial(self):
+        index = get_title_index(RFC_INDEX)
+        documents = [
+            (str(number), f"  Informational  body of {number}\n".encode())
+            for number in (80, 8446, 1234, 9000) * 20
+        ] + [("rfc-ref", b"not an rfc")]
+        serial = [parse_document(document, index) for document in documents]
+        parallel = list(parse_in_parallel(documents, index, workers=2, chunk_size=7))
+        self.assertEqual(parallel, serial)
+        self.assertEqual(serial[1][:2], (8446, index[8446].heading))
+        self.assertEqual(serial[1][2], "Informational  body of 8446")
+        self.assertIsNone(serial[2])
+        self.assertIsNone(serial[-1])
+
     def test_strip_extensions(self):
         files = [
             "rfc1918.txt",
@@ -93,6 +179,27 @@ class TestUtils(unittest.TestCase):
     def test_uncompress_tar(self):
         pass
 
+    def test_iter_tar_rfcs(self):
+        tar_path = os.path.join(Config.TESTS_FOLDER, "RFC-all.tar.gz")
+        make_tar(
+            tar_path,
+            {
+                "rfc1918.txt": "  Address Allocation  \n",
+                "rfc1918.pdf": "binary",
+                "rfc8305a.txt": "ascii art",
+                "rfc-index.txt": "1918 Address Allocation.",
+                "rfc8305.txt": "Happy Eyeballs",
+            },
+        )
+        result = list(iter_tar_rfcs(tar_path))
+        self.assertEqual(
+            result, [("1918", "Address Allocation"), ("8305", "Happy Eyeballs")]
+        )
+        self.assertEqual(read_tar_index(tar_path), "1918 Address Allocation.")
+        self.assertFalse(
+            os.path.exists(os.path.join(Config.TESTS_FOLDER, "rfc1918.txt"))
+        )
+
     @responses.activate
     def test_download_rfc(self):
         responses.add(